@@ -11,18 +11,28 @@ from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+# Profile thread/oneDNN phải áp dụng trước khi import TensorFlow (qua model_utils)
+from runtime_config import apply_profile
+apply_profile(os.environ.get('TF_EXECUTION_PROFILE', 'latency'))
+
 # Import các hàm tiện ích
 from data_utils import load_data, add_technical_indicators
-from model_utils import preprocess_data, build_model, train_model, evaluate_model
+from model_utils import (
+    preprocess_data, build_model, train_model, evaluate_model, training_cutoff,
+    TrainingTelemetry, telemetry_metadata, telemetry_log_path, write_telemetry_log, load_telemetry_log
+)
 
 # Import các thư viện ML cần thiết cho app.py
 from tensorflow.keras.models import load_model as keras_load_model
 from tensorflow.keras.callbacks import EarlyStopping
 import tensorflow as tf
-from predict_future import predict_future
+from predict_future import predict_future, get_output_horizon, get_ensemble_size
+from training_jobs import JobStore, submit_training_job, ensure_worker, ACTIVE_STATES
 from arima_model import (
     prepare_data_for_arima, train_arima_model, predict_arima, 
-    evaluate_arima_model, compare_models_performance, check_stationarity
+    evaluate_arima_model, compare_models_performance, check_stationarity,
+    find_optimal_arima_params, stepwise_arima_search, default_fit_workers, rolling_one_step_forecast,
+    stationarity_summary
 )
 
 # Cấu hình trang
@@ -605,6 +615,49 @@ if 'y_test_inv' not in st.session_state:
     st.session_state.y_test_inv = None
 if 'y_pred_inv' not in st.session_state:
     st.session_state.y_pred_inv = None
+if 'training_telemetry' not in st.session_state:
+    st.session_state.training_telemetry = None
+if 'trained_until' not in st.session_state:
+    st.session_state.trained_until = None
+
+def render_training_telemetry(epoch_df):
+    """
+    Hiển thị telemetry theo epoch (DataFrame từ TrainingTelemetry / load_telemetry_log).
+    """
+    if epoch_df is None or epoch_df.empty:
+        st.info("📭 Chưa có dữ liệu telemetry")
+        return
+    if 'run_id' in epoch_df.columns and epoch_df['run_id'].nunique() > 1:
+        # Log có nhiều lần huấn luyện (ví dụ fine-tune): hiển thị lần gần nhất
+        st.caption(f"Log có {epoch_df['run_id'].nunique()} lần huấn luyện, hiển thị lần gần nhất")
+        epoch_df = epoch_df[epoch_df['run_id'] == epoch_df['run_id'].iloc[-1]]
+    tcol1, tcol2, tcol3, tcol4 = st.columns(4)
+    with tcol1:
+        st.metric("Mẫu/giây (TB)", f"{epoch_df['samples_per_sec'].mean():,.0f}")
+    with tcol2:
+        st.metric("Batch p50 / p90", f"{epoch_df['batch_ms_p50'].median():.1f} / {epoch_df['batch_ms_p90'].median():.1f} ms")
+    with tcol3:
+        st.metric("RSS cao nhất", f"{epoch_df['rss_mb'].max():,.0f} MB")
+    with tcol4:
+        st.metric("CPU (TB)", f"{epoch_df['cpu_utilisation'].mean():.0f}%",
+                  help="Thời gian CPU của process / thời gian thực / số core được phép dùng")
+
+    fig_telemetry = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_telemetry.add_trace(go.Scatter(x=epoch_df['epoch'], y=epoch_df['samples_per_sec'],
+                                       mode='lines+markers', name='Mẫu/giây'))
+    for column, label in [('batch_ms_p50', 'Batch p50 (ms)'), ('batch_ms_p90', 'Batch p90 (ms)'),
+                          ('batch_ms_p99', 'Batch p99 (ms)')]:
+        fig_telemetry.add_trace(go.Scatter(x=epoch_df['epoch'], y=epoch_df[column], mode='lines',
+                                           name=label, line=dict(dash='dot')), secondary_y=True)
+    fig_telemetry.update_layout(title="Thông lượng và độ trễ batch theo epoch", xaxis_title="Epoch",
+                                hovermode='x unified')
+    fig_telemetry.update_yaxes(title_text="Mẫu/giây", secondary_y=False)
+    fig_telemetry.update_yaxes(title_text="ms", secondary_y=True)
+    st.plotly_chart(fig_telemetry, use_container_width=True)
+
+    columns = ['epoch', 'wall_seconds', 'train_seconds', 'samples_per_sec', 'batch_ms_p50', 'batch_ms_p90', 'batch_ms_p99',
+               'rss_mb', 'cpu_percent', 'cpu_utilisation', 'load_avg_1m', 'loss', 'val_loss']
+    st.dataframe(epoch_df[[c for c in columns if c in epoch_df.columns]].round(2), use_container_width=True)
 
 # Sidebar - Professional data loading section
 st.sidebar.markdown("""
@@ -976,6 +1029,21 @@ if st.session_state.data is not None:
                 value=2,
                 help="Số hidden layers trong mô hình. Nhiều layer = học được pattern phức tạp hơn"
             )
+            
+            output_horizon = st.slider(
+                "🎯 Số ngày dự đoán trực tiếp (đầu ra)",
+                min_value=1,
+                max_value=20,
+                value=1,
+                help="1 = dự đoán từng ngày rồi lặp đệ quy. Lớn hơn 1 = đầu ra Dense(n) dự đoán cả n ngày trong một lần, không tích lũy sai số"
+            )
+            
+            precision = st.selectbox(
+                "🧮 Độ chính xác tính toán",
+                options=['float32', 'mixed_bfloat16'],
+                index=0,
+                help="mixed_bfloat16: các layer LSTM/GRU tính bằng bfloat16 (nhanh hơn trên CPU hỗ trợ AVX512-BF16/AMX), đầu ra vẫn float32"
+            )
         
         with col2:
             st.markdown("""
@@ -1186,6 +1254,8 @@ if st.session_state.data is not None:
             'time_step': time_step,
             'validation_split': validation_split,
             'learning_rate': learning_rate,
+            'n_future': output_horizon,
+            'precision': None if precision == 'float32' else precision,
             'features_to_use': features_to_use,
             'target_column': target_column
         }
@@ -1242,11 +1312,13 @@ if st.session_state.data is not None:
                             st.session_state.data.dropna(),
                             config['features_to_use'],
                             config['target_column'],
-                            config['time_step']
+                            config['time_step'],
+                            n_future=config.get('n_future', 1)
                         )
                         
                         st.session_state.scaler = scaler
                         st.session_state.scaled_data = scaled_data
+                        st.session_state.trained_until = training_cutoff(st.session_state.data.dropna())
                         st.session_state.X_test = X_test
                         st.session_state.y_test = y_test
                         # Ghi thông tin cấu hình mô hình ra file JSON để minh bạch tái lập
@@ -1279,7 +1351,7 @@ if st.session_state.data is not None:
                             } for _ in range(int(config['num_hidden_layers']))]
                             nn_layers.append({
                                 "type": "Dense",
-                                "units": 1,
+                                "units": int(config.get('n_future', 1)),
                                 "activation": "linear"
                             })
 
@@ -1340,7 +1412,9 @@ if st.session_state.data is not None:
                             config['num_neurons'],
                             config['dropout_rate'],
                             config['num_hidden_layers'],
-                            learning_rate=config.get('learning_rate', 0.001)
+                            learning_rate=config.get('learning_rate', 0.001),
+                            n_future=config.get('n_future', 1),
+                            precision=config.get('precision')
                         )
                         
                         # Callback
@@ -1362,16 +1436,20 @@ if st.session_state.data is not None:
                                 progress_bar.progress(progress)
                                 status_text.text(f"Epoch {epoch + 1}/{config['epochs']} - Loss: {logs['loss']:.4f} - Val Loss: {logs['val_loss']:.4f}")
                         
+                        # Telemetry: thời gian epoch, mẫu/giây, độ trễ batch, RSS, CPU (lưu kèm khi lưu mô hình)
+                        telemetry = TrainingTelemetry(metadata=telemetry_metadata(config, source='dashboard'))
+                        
                         # Huấn luyện
                         history = train_model(
                             model,
                             X_train, y_train,
                             config,
-                            callbacks=[early_stopping, StreamlitCallback()]
+                            callbacks=[early_stopping, StreamlitCallback(), telemetry]
                         )
                         
                         st.session_state.model = model
                         st.session_state.training_history = history
+                        st.session_state.training_telemetry = telemetry.records
                         
                         # Đánh giá mô hình (trong cùng khối spinner)
                         metrics, y_test_inv, y_pred_inv = evaluate_model(
@@ -1379,8 +1457,9 @@ if st.session_state.data is not None:
                             config['features_to_use'].index(config['target_column'])
                         )
                         
-                        st.session_state.y_test_inv = y_test_inv
-                        st.session_state.y_pred_inv = y_pred_inv
+                        # Mô hình multi-output: hiển thị dự đoán của ngày đầu tiên trong horizon
+                        st.session_state.y_test_inv = y_test_inv if y_test_inv.ndim == 1 else y_test_inv[:, 0]
+                        st.session_state.y_pred_inv = y_pred_inv if y_pred_inv.ndim == 1 else y_pred_inv[:, 0]
                         st.session_state.model_metrics = metrics
                     
                     st.success("🎉 Huấn luyện và đánh giá hoàn tất!")
@@ -1426,6 +1505,12 @@ if st.session_state.data is not None:
                         )
                         st.plotly_chart(fig_loss, use_container_width=True)
                         
+                        if st.session_state.training_telemetry:
+                            with st.expander("⏱️ Telemetry huấn luyện"):
+                                render_training_telemetry(pd.DataFrame(
+                                    [r for r in st.session_state.training_telemetry if r['event'] == 'epoch']
+                                ))
+                        
                         # Biểu đồ so sánh dự đoán
                         fig_pred = go.Figure()
                         fig_pred.add_trace(go.Scatter(
@@ -1449,6 +1534,86 @@ if st.session_state.data is not None:
                     
                 except Exception as e:
                     st.error(f"❌ Lỗi trong quá trình huấn luyện: {e}")
+            
+            # Hàng đợi huấn luyện chạy nền: job chạy trong worker process riêng, dashboard không bị khóa
+            st.markdown("---")
+            st.subheader("📥 Hàng đợi huấn luyện (chạy nền)")
+            job_col1, job_col2 = st.columns([3, 1])
+            with job_col1:
+                job_name = st.text_input(
+                    "Tên mô hình của job",
+                    value=f"model_{config['model_type'].lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                    key="training_job_name",
+                    help="Chỉ giữ chữ, số, '-' và '_'; mô hình được lưu thành <tên>_job<id>"
+                )
+            with job_col2:
+                st.write("")
+                if st.button("📥 Đưa vào hàng đợi", use_container_width=True):
+                    try:
+                        job_id = submit_training_job(st.session_state.data, dict(config), name=job_name)
+                        st.success(f"✅ Đã thêm job #{job_id} vào hàng đợi. Có thể chuyển tab trong lúc huấn luyện.")
+                    except Exception as e:
+                        st.error(f"❌ Không thể tạo job: {e}")
+            
+            @st.fragment(run_every=3)
+            def training_jobs_panel():
+                # Fragment tự chạy lại mỗi 3 giây để đọc tiến độ từ CSDL job
+                job_store = JobStore()
+                jobs = job_store.list_jobs(limit=10)
+                if not jobs:
+                    st.info("📭 Chưa có job nào")
+                    return
+                if any(job['status'] == 'queued' for job in jobs) and not job_store.live_workers():
+                    ensure_worker()
+                
+                status_labels = {
+                    'queued': '⏳ Đang chờ', 'running': '🏃 Đang chạy', 'done': '✅ Hoàn tất',
+                    'failed': '❌ Lỗi', 'cancelled': '🛑 Đã hủy'
+                }
+                for job in jobs:
+                    cols = st.columns([3, 4, 1])
+                    with cols[0]:
+                        st.write(f"**#{job['id']} {job['name']}** — {status_labels.get(job['status'], job['status'])}")
+                    with cols[1]:
+                        if job['status'] == 'running':
+                            st.progress(min(1.0, job['epoch'] / max(1, job['total_epochs'])))
+                            if job['loss'] is not None:
+                                st.caption(f"Epoch {job['epoch']}/{job['total_epochs']} - Loss: {job['loss']:.4f} - Val Loss: {job['val_loss']:.4f}")
+                        elif job['status'] == 'done' and job['metrics']:
+                            st.caption(f"MAE: {job['metrics']['MAE']:.2f} | RMSE: {job['metrics']['RMSE']:.2f} | R²: {job['metrics']['R²']:.4f}")
+                        elif job['status'] == 'failed':
+                            st.caption(job['error'] or "")
+                    with cols[2]:
+                        if job['status'] in ACTIVE_STATES:
+                            if st.button("🛑 Hủy", key=f"cancel_job_{job['id']}"):
+                                job_store.request_cancel(job['id'])
+                                st.rerun(scope="fragment")
+                        elif job['status'] == 'done':
+                            if st.button("📂 Tải", key=f"load_job_{job['id']}"):
+                                try:
+                                    st.session_state.model = keras_load_model(
+                                        f"models/{job['model_name']}.h5",
+                                        custom_objects={
+                                            'mae': tf.keras.metrics.MeanAbsoluteError(),
+                                            'mse': tf.keras.metrics.MeanSquaredError()
+                                        }
+                                    )
+                                    with open(f"models/{job['model_name']}_scaler.pkl", 'rb') as f:
+                                        st.session_state.scaler = pickle.load(f)
+                                    with open(f"models/{job['model_name']}_config.pkl", 'rb') as f:
+                                        st.session_state.model_config = pickle.load(f)
+                                    st.session_state.trained_until = st.session_state.model_config.get('trained_until')
+                                    st.session_state.model_metrics = job['metrics']
+                                    if st.session_state.data is not None:
+                                        features = job['config']['features_to_use']
+                                        st.session_state.scaled_data = st.session_state.scaler.transform(
+                                            st.session_state.data.dropna()[features].to_numpy(dtype=np.float32)
+                                        )
+                                    st.rerun()
+                                except Exception as e:
+                                    st.error(f"❌ Lỗi khi tải mô hình của job: {e}")
+            
+            training_jobs_panel()
         else:
             st.warning("⚠️ Vui lòng cấu hình mô hình trước khi huấn luyện!")
     
@@ -1458,11 +1623,13 @@ if st.session_state.data is not None:
         if st.session_state.model is not None and st.session_state.scaler is not None:
             st.subheader("Cấu hình dự đoán")
 
+            # Mô hình multi-output chỉ dự đoán được tối đa số ngày của đầu ra
+            output_horizon = get_output_horizon(st.session_state.model)
             n_future = st.slider(
                 "Số ngày dự đoán",
                 min_value=1,
-                max_value=20,
-                value=5,
+                max_value=output_horizon if output_horizon > 1 else 20,
+                value=min(5, output_horizon) if output_horizon > 1 else 5,
                 help="Số ngày muốn dự đoán trong tương lai"
             )
 
@@ -1488,21 +1655,26 @@ if st.session_state.data is not None:
                                 future_dates.append(current_date)
                                 days_added += 1
 
-                        for i in range(n_future):
-                            preds = predict_future(
-                                st.session_state.model,
-                                st.session_state.scaled_data,
-                                config['time_step'],
-                                i+1,
-                                st.session_state.scaler,
-                                len(config['features_to_use']),
-                                config['features_to_use'].index(config['target_column']),
-                                config['features_to_use']
-                            )
-                            # Lấy giá trị dự đoán mới nhất
-                            future_predictions.append(preds[-1])
+                        def on_step(i, pred):
+                            future_predictions.append(pred)
                             progress_bar.progress((i+1)/n_future)
                             status_text.text(f"Dự đoán ngày {i+1}/{n_future}")
+
+                        # Một lượt rollout duy nhất, nhận kết quả từng ngày để cập nhật progress.
+                        # Với mô hình ensemble, mỗi bước là một lần forward cho mọi thành viên và có thêm độ lệch chuẩn
+                        _, future_spread = predict_future(
+                            st.session_state.model,
+                            st.session_state.scaled_data,
+                            config['time_step'],
+                            n_future,
+                            st.session_state.scaler,
+                            len(config['features_to_use']),
+                            config['features_to_use'].index(config['target_column']),
+                            config['features_to_use'],
+                            on_step=on_step,
+                            return_spread=True
+                        )
+                        is_ensemble = get_ensemble_size(st.session_state.model) > 1
                         st.session_state.future_predictions = future_predictions
                         progress_bar.empty()
                         status_text.empty()
@@ -1516,6 +1688,8 @@ if st.session_state.data is not None:
                         'Ngày': future_dates,
                         'Giá dự đoán': future_predictions
                     })
+                    if is_ensemble:
+                        prediction_df['Độ lệch chuẩn (ensemble)'] = future_spread
 
                     # Hiển thị bảng dự đoán
                     st.dataframe(prediction_df, use_container_width=True)
@@ -1533,6 +1707,18 @@ if st.session_state.data is not None:
                         line=dict(color='blue')
                     ))
 
+                    if is_ensemble:
+                        # Dải ±2 độ lệch chuẩn giữa các thành viên ensemble
+                        fig.add_trace(go.Scatter(
+                            x=list(future_dates) + list(future_dates)[::-1],
+                            y=list(np.array(future_predictions) + 2 * future_spread) +
+                              list(np.array(future_predictions) - 2 * future_spread)[::-1],
+                            fill='toself',
+                            fillcolor='rgba(255, 0, 0, 0.12)',
+                            line=dict(color='rgba(255, 0, 0, 0)'),
+                            name='±2σ ensemble'
+                        ))
+
                     # Dự đoán tương lai
                     fig.add_trace(go.Scatter(
                         x=future_dates,
@@ -1603,8 +1789,23 @@ if st.session_state.data is not None:
                 st.write(f"- P-value: {stationarity_test['p_value']:.4f}")
                 st.write(f"- Chuỗi dừng: {'✅ Có' if stationarity_test['is_stationary'] else '❌ Không'}")
                 
+                # Kết quả đã được cache theo fingerprint của chuỗi nên không tính lại khi rerun
+                diagnostics = stationarity_summary(series)
+                with st.expander(f"🔍 ADF/KPSS theo bậc sai phân (d gợi ý = {diagnostics['ndiffs']})"):
+                    st.dataframe(pd.DataFrame([{
+                        'd': r['d'],
+                        'ADF Statistic': round(float(r['adf_statistic']), 4),
+                        'ADF p-value': round(float(r['p_value']), 4),
+                        'KPSS Statistic': round(float(r['kpss_statistic']), 4),
+                        'KPSS p-value': round(float(r['kpss_p_value']), 4),
+                        'Dừng (ADF)': '✅' if r['is_stationary'] else '❌',
+                        'Dừng (KPSS)': '✅' if r['kpss_stationary'] else '❌'
+                    } for r in diagnostics['by_d']]), use_container_width=True)
+                
                 # Tùy chọn tham số ARIMA
                 auto_arima = st.checkbox("Tự động tìm tham số tối ưu", value=True)
+                arima_seasonal_order = None
+                arima_seasonal = False
                 
                 if not auto_arima:
                     col_p, col_d, col_q = st.columns(3)
@@ -1617,10 +1818,43 @@ if st.session_state.data is not None:
                     arima_order = (p, d, q)
                 else:
                     arima_order = None
+                    arima_search = st.radio(
+                        "Chiến lược tìm kiếm",
+                        ["grid", "stepwise"],
+                        format_func=lambda s: "Lưới (p, d, q ≤ 3)" if s == "grid" else "Stepwise (Hyndman-Khandakar)",
+                        horizontal=True
+                    )
+                    arima_period = 5
+                    arima_screening = "mle"
+                    if arima_search == "grid":
+                        if st.checkbox("Bổ sung ứng viên từ CSS", value=False,
+                                       help="Fit đầy đủ thêm 5 order có AIC CSS tốt nhất ngoài các order từ pre-fit MLE. "
+                                            "Kết quả bằng hoặc tốt hơn mặc định nhưng chậm hơn một chút"):
+                            arima_screening = "css"
+                    if arima_search == "stepwise":
+                        arima_seasonal = st.checkbox("Có thành phần mùa vụ (SARIMA)", value=False)
+                        if arima_seasonal:
+                            arima_period = st.number_input("Chu kỳ mùa vụ m (phiên)", min_value=2, max_value=60, value=5)
+                    arima_workers = st.number_input(
+                        "Số process tìm tham số",
+                        min_value=1,
+                        max_value=os.cpu_count() or 1,
+                        value=default_fit_workers(),
+                        help="Các tổ hợp (p, d, q) được fit song song trên nhiều process (mỗi process khởi động mất vài giây). "
+                             "1 = fit tuần tự trong app, khi đó không áp dụng giới hạn thời gian cho từng fit"
+                    )
                 
                 # Tỷ lệ chia dữ liệu
                 train_ratio = st.slider("Tỷ lệ dữ liệu huấn luyện (%)", 60, 90, 80) / 100
                 
+                arima_eval_mode = st.radio(
+                    "Cách dự đoán trên tập test",
+                    ["rolling", "multi_step"],
+                    format_func=lambda m: ("Một bước (rolling, giống LSTM/GRU)" if m == "rolling"
+                                           else "Nhiều bước từ cuối tập train"),
+                    help="Rolling: mỗi ngày dự đoán từ dữ liệu thật tới hôm trước, chỉ cập nhật Kalman filter, không fit lại"
+                )
+                
             with col2:
                 st.subheader("📊 Kết quả so sánh")
                 
@@ -1632,14 +1866,34 @@ if st.session_state.data is not None:
                             train_data = series[:train_size]
                             test_data = series[train_size:]
                             
-                            # Huấn luyện ARIMA
-                            arima_model, final_order = train_arima_model(train_data, arima_order)
+                            # Tìm tham số song song (nếu bật) rồi huấn luyện ARIMA
+                            if arima_order is None and arima_seasonal:
+                                arima_order, arima_seasonal_order, aic_table = stepwise_arima_search(
+                                    train_data, max_p=5, max_q=5, seasonal=True, m=int(arima_period),
+                                    max_workers=arima_workers
+                                )
+                                st.session_state.arima_aic_table = aic_table
+                            elif arima_order is None:
+                                arima_order, aic_table = find_optimal_arima_params(
+                                    train_data, max_workers=arima_workers, search=arima_search, screening=arima_screening,
+                                    p_range=range(0, 6) if arima_search == "stepwise" else range(0, 4),
+                                    q_range=range(0, 6) if arima_search == "stepwise" else range(0, 4)
+                                )
+                                st.session_state.arima_aic_table = aic_table
+                            arima_model, final_order = train_arima_model(train_data, arima_order, arima_seasonal_order)
                             
                             if arima_model is not None:
-                                st.success(f"✅ ARIMA{final_order} huấn luyện thành công!")
+                                seasonal_label = f"x{arima_seasonal_order}" if arima_seasonal_order else ""
+                                st.success(f"✅ ARIMA{final_order}{seasonal_label} huấn luyện thành công!")
+                                if auto_arima and 'arima_aic_table' in st.session_state:
+                                    with st.expander("📋 Bảng AIC của các tham số đã thử"):
+                                        st.dataframe(st.session_state.arima_aic_table, use_container_width=True)
                                 
                                 # Dự đoán ARIMA
-                                arima_predictions = predict_arima(arima_model, len(test_data))
+                                if arima_eval_mode == "rolling":
+                                    arima_predictions = rolling_one_step_forecast(arima_model, test_data)
+                                else:
+                                    arima_predictions = predict_arima(arima_model, len(test_data))
                                 
                                 if arima_predictions is not None:
                                     # Đánh giá ARIMA
@@ -1769,8 +2023,18 @@ if st.session_state.data is not None:
                         with open(f"models/{model_name}_scaler.pkl", 'wb') as f:
                             pickle.dump(st.session_state.scaler, f)
                         
+                        # Mốc dòng train cuối để cập nhật tăng dần biết các phiên nào là mới
+                        saved_config = dict(st.session_state.model_config)
+                        if st.session_state.trained_until:
+                            saved_config['trained_until'] = st.session_state.trained_until
+                        else:
+                            st.warning("⚠️ Không rõ mốc dữ liệu huấn luyện, mô hình này sẽ không cập nhật tăng dần tự động được")
                         with open(f"models/{model_name}_config.pkl", 'wb') as f:
-                            pickle.dump(st.session_state.model_config, f)
+                            pickle.dump(saved_config, f)
+                        
+                        # Log telemetry của lần huấn luyện gần nhất, đặt cạnh mô hình
+                        if st.session_state.training_telemetry:
+                            write_telemetry_log(st.session_state.training_telemetry, telemetry_log_path(model_path))
                         
                         st.success(f"✅ Đã lưu mô hình: {model_name}")
                         
@@ -1793,6 +2057,14 @@ if st.session_state.data is not None:
                         key="load_model_selectbox"
                     )
                     
+                    selected_telemetry_path = telemetry_log_path(os.path.join("models", selected_model_load))
+                    if os.path.exists(selected_telemetry_path):
+                        with st.expander("⏱️ Telemetry huấn luyện của mô hình"):
+                            try:
+                                render_training_telemetry(load_telemetry_log(selected_telemetry_path))
+                            except Exception as e:
+                                st.warning(f"⚠️ Không đọc được log telemetry: {e}")
+                    
                     if st.button("📂 Tải mô hình"):
                         try:
                             model_name = selected_model_load.replace(".h5", ".h5")
@@ -1813,6 +2085,7 @@ if st.session_state.data is not None:
                             # Tải config
                             with open(f"models/{model_name.replace('.h5', '')}_config.pkl", 'rb') as f:
                                 st.session_state.model_config = pickle.load(f)
+                            st.session_state.trained_until = st.session_state.model_config.get('trained_until')
                             
                             # Tính lại scaled_data để sử dụng cho predict_future
                             if st.session_state.data is not None:
@@ -1820,7 +2093,7 @@ if st.session_state.data is not None:
                                     df = st.session_state.data.dropna()
                                     features = st.session_state.model_config['features_to_use']
                                     # Chuẩn hóa theo scaler đã load
-                                    data_to_scale = df[features].values
+                                    data_to_scale = df[features].to_numpy(dtype=np.float32)
                                     scaled_data = st.session_state.scaler.transform(data_to_scale)
                                     st.session_state.scaled_data = scaled_data
                                     st.success(f"✅ Đã tải mô hình: {model_name.replace('.h5', '')} - Sẵn sàng dự đoán!")
@@ -1858,6 +2131,7 @@ if st.session_state.data is not None:
                             model_path = f"models/{model_base_name}.h5"
                             scaler_path = f"models/{model_base_name}_scaler.pkl"
                             config_path = f"models/{model_base_name}_config.pkl"
+                            telemetry_path = telemetry_log_path(model_path)
 
                             if os.path.exists(model_path):
                                 os.remove(model_path)
@@ -1865,6 +2139,8 @@ if st.session_state.data is not None:
                                 os.remove(scaler_path)
                             if os.path.exists(config_path):
                                 os.remove(config_path)
+                            if os.path.exists(telemetry_path):
+                                os.remove(telemetry_path)
                             st.success(f"✅ Đã xóa mô hình: {model_base_name}")
                             # Attempt to refresh the page; wrap in case the method is unavailable
                             try:
@@ -0,0 +1,128 @@
+"""
+Chạy ARIMA hàng loạt cho nhiều chuỗi (nhiều mã cổ phiếu hoặc nhiều cột như High/Low/Close).
+Mỗi chuỗi được tìm tham số, huấn luyện, đánh giá one-step trên tập test và dự báo tiếp
+n_forecast ngày trong một worker process riêng; kết quả được trả về (và ghi ra CSV) ngay khi
+từng chuỗi xong, tạo thành bảng gọn: order, AIC, metrics, forecast.
+"""
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+RESULT_COLUMNS = ['series', 'p', 'd', 'q', 'aic', 'MAE', 'MSE', 'RMSE', 'R²',
+                  'n_train', 'n_test', 'forecast', 'status', 'error', 'seconds']
+
+def series_from_columns(df, columns=('High', 'Low', 'Close')):
+    """
+    Tách các cột của một DataFrame giá thành dict {tên cột: chuỗi}.
+    """
+    return {column: df[column].dropna() for column in columns if column in df.columns}
+
+def series_from_files(file_paths, target_column='Close'):
+    """
+    Đọc nhiều file CSV (mỗi file một mã) thành dict {mã: chuỗi target_column}.
+    Mã lấy theo phần tên file trước dấu '_' đầu tiên (giống path_utils.get_stock_symbol).
+    """
+    from data_utils import load_data
+
+    series = {}
+    for file_path in file_paths:
+        symbol = os.path.basename(file_path).split('_')[0].split('.')[0]
+        series[symbol] = load_data(file_path)[target_column].dropna()
+    return series
+
+def _fit_forecast_series(name, values, train_ratio, order, search, n_forecast, use_cache):
+    from arima_model import (
+        find_optimal_arima_params, train_arima_model, rolling_one_step_forecast, evaluate_arima_model
+    )
+
+    start = time.perf_counter()
+    values = np.asarray(values, dtype=float)
+    train_size = int(len(values) * train_ratio)
+    train_values, test_values = values[:train_size], values[train_size:]
+    result = {'series': name, 'n_train': len(train_values), 'n_test': len(test_values)}
+    try:
+        if order is None:
+            # Mỗi worker đã là một process riêng nên tìm tham số tuần tự bên trong
+            order, _ = find_optimal_arima_params(train_values, max_workers=1, search=search, use_cache=use_cache)
+        fitted_model, order = train_arima_model(train_values, order, use_cache=use_cache)
+        if fitted_model is None:
+            raise RuntimeError("Không huấn luyện được ARIMA")
+
+        aic = float(fitted_model.aic)
+        metrics = {}
+        if len(test_values):
+            predictions = rolling_one_step_forecast(fitted_model, test_values)
+            metrics = evaluate_arima_model(test_values, predictions) or {}
+            # Cập nhật trạng thái tới cuối chuỗi (không fit lại) rồi mới dự báo tương lai
+            fitted_model = fitted_model.extend(test_values)
+        forecast = np.asarray(fitted_model.forecast(n_forecast))
+
+        result.update({
+            'p': order[0], 'd': order[1], 'q': order[2],
+            'aic': aic,
+            **{metric: float(value) for metric, value in metrics.items()},
+            'forecast': [round(float(value), 4) for value in forecast],
+            'status': 'ok', 'error': None
+        })
+    except Exception as e:
+        result.update({'status': 'error', 'error': str(e)})
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+def iter_arima_batch(series_dict, train_ratio=0.8, order=None, search='stepwise', n_forecast=5,
+                     max_workers=None, use_cache=True):
+    """
+    Generator: yield dict kết quả của từng chuỗi ngay khi worker xử lý xong (thứ tự hoàn thành).
+    order=None thì tự tìm tham số theo `search` ('stepwise' hoặc 'grid') cho từng chuỗi.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    # statsmodels/TensorFlow trong process cha không an toàn với fork nên dùng spawn
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context('spawn')) as executor:
+        futures = [
+            executor.submit(_fit_forecast_series, name, np.asarray(series, dtype=float),
+                            train_ratio, order, search, n_forecast, use_cache)
+            for name, series in series_dict.items()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+def run_arima_batch(series_dict, train_ratio=0.8, order=None, search='stepwise', n_forecast=5,
+                    max_workers=None, use_cache=True, output_path=None, on_result=None):
+    """
+    Chạy ARIMA cho mọi chuỗi trong series_dict trên process pool.
+
+    Args:
+        series_dict: dict {tên chuỗi: Series/array giá}
+        output_path: nếu có, mỗi kết quả được ghi thêm vào file CSV ngay khi xong
+        on_result: callback on_result(result) gọi mỗi khi một chuỗi xong (optional)
+
+    Returns:
+        DataFrame kết quả (RESULT_COLUMNS) sắp theo tên chuỗi
+    """
+    if output_path is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        pd.DataFrame(columns=RESULT_COLUMNS).to_csv(output_path, index=False)
+
+    results = []
+    for done, result in enumerate(iter_arima_batch(
+            series_dict, train_ratio, order, search, n_forecast, max_workers, use_cache), start=1):
+        results.append(result)
+        if result['status'] == 'ok':
+            print(f"✅ [{done}/{len(series_dict)}] {result['series']}: ARIMA({result['p']}, {result['d']}, {result['q']}) "
+                  f"RMSE={result.get('RMSE', np.nan):.4f} ({result['seconds']}s)")
+        else:
+            print(f"❌ [{done}/{len(series_dict)}] {result['series']}: {result['error']}")
+        if output_path is not None:
+            pd.DataFrame([result]).reindex(columns=RESULT_COLUMNS).to_csv(
+                output_path, mode='a', header=False, index=False
+            )
+        if on_result is not None:
+            on_result(result)
+
+    table = pd.DataFrame(results).reindex(columns=RESULT_COLUMNS).sort_values('series').reset_index(drop=True)
+    # Chuỗi lỗi không có order, dùng kiểu Int64 để p, d, q vẫn là số nguyên
+    return table.astype({'p': 'Int64', 'd': 'Int64', 'q': 'Int64'})
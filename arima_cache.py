@@ -0,0 +1,113 @@
+"""
+Cache kết quả fit ARIMA trên đĩa, đánh địa chỉ theo nội dung:
+khóa = SHA-256 của chuỗi huấn luyện + order + seasonal_order + trend + maxiter.
+Mỗi mục lưu tham số đã fit và AIC trong một file pickle riêng. Khi tổng dung lượng
+hoặc số mục vượt giới hạn, các mục ít được dùng gần đây nhất (theo mtime) bị xóa trước.
+"""
+import os
+import hashlib
+import pickle
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'arima_cache')
+
+class ArimaFitCache:
+    """
+    Cache fit ARIMA dùng chung giữa các process (ghi file tạm rồi os.replace nên an toàn
+    khi nhiều worker cùng ghi). Đối tượng chỉ chứa đường dẫn và giới hạn nên pickle được
+    để truyền sang worker của ProcessPoolExecutor.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=64 * 1024 * 1024, max_entries=5000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(data, order, seasonal_order=(0, 0, 0, 0), trend=None, maxiter=None):
+        values = np.ascontiguousarray(np.asarray(data, dtype=np.float64))
+        digest = hashlib.sha256(values.tobytes())
+        spec = (tuple(int(v) for v in order), tuple(int(v) for v in seasonal_order), trend, maxiter)
+        digest.update(repr(spec).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Trả về dict {'params', 'param_names', 'aic', ...} hoặc None nếu chưa có.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            # Cập nhật mtime để đánh dấu vừa được dùng (LRU)
+            os.utime(path)
+            return entry
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, params, aic, param_names=None, **metadata):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            'params': np.asarray(params, dtype=np.float64),
+            'param_names': list(param_names) if param_names is not None else None,
+            'aic': float(aic),
+            **metadata
+        }
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for item in it:
+                    if item.name.endswith('.pkl'):
+                        try:
+                            stat = item.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, item.path))
+        except FileNotFoundError:
+            return
+
+        total_bytes = sum(size for _, size, _ in entries)
+        if total_bytes <= self.max_bytes and len(entries) <= self.max_entries:
+            return
+        # Xóa từ mục cũ nhất cho tới khi về dưới giới hạn
+        entries.sort()
+        remaining = len(entries)
+        for _, size, path in entries:
+            if total_bytes <= self.max_bytes and remaining <= self.max_entries:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            remaining -= 1
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+
+_default_cache = None
+
+def get_default_fit_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ArimaFitCache()
+    return _default_cache
@@ -1,57 +1,495 @@
+import os
+import copy
+import hashlib
+import signal
+import threading
+import multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
+from scipy.optimize import least_squares
+from scipy.signal import lfilter
+from arima_cache import get_default_fit_cache
 from statsmodels.tsa.arima.model import ARIMA
-from statsmodels.tsa.stattools import adfuller
+from statsmodels.tsa.stattools import adfuller, kpss
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import warnings
 warnings.filterwarnings('ignore')
 
+# Cache kết quả kiểm định tính dừng theo fingerprint của chuỗi (LRU trong bộ nhớ),
+# dùng chung cho tab huấn luyện, tab ARIMA và bước chọn d của auto-ARIMA
+_STATIONARITY_CACHE = OrderedDict()
+_STATIONARITY_CACHE_SIZE = 64
+# Streamlit chạy script của mỗi session trong một thread riêng nên cache cần khóa
+_STATIONARITY_LOCK = threading.Lock()
+
+def _stationarity_cache_get(key):
+    # Trả về bản copy để người gọi sửa kết quả không làm hỏng cache
+    with _STATIONARITY_LOCK:
+        value = _STATIONARITY_CACHE.get(key)
+        if value is None:
+            return None
+        _STATIONARITY_CACHE.move_to_end(key)
+    return copy.deepcopy(value)
+
+def _stationarity_cache_put(key, value):
+    with _STATIONARITY_LOCK:
+        _STATIONARITY_CACHE[key] = value
+        _STATIONARITY_CACHE.move_to_end(key)
+        while len(_STATIONARITY_CACHE) > _STATIONARITY_CACHE_SIZE:
+            _STATIONARITY_CACHE.popitem(last=False)
+    return copy.deepcopy(value)
+
+def series_fingerprint(timeseries):
+    """
+    Fingerprint của chuỗi theo giá trị (không phụ thuộc index), dùng làm khóa cache.
+    """
+    values = np.ascontiguousarray(np.asarray(timeseries, dtype=np.float64))
+    return hashlib.sha1(values.tobytes()).hexdigest()
+
+def stationarity_summary(timeseries, max_d=2):
+    """
+    Kiểm định ADF và KPSS cho chuỗi sai phân bậc d = 0..max_d trong một lần gọi, cache theo fingerprint.
+
+    Returns:
+        dict 'by_d': danh sách kết quả cho từng d (adf_statistic, p_value, critical_values,
+        is_stationary theo ADF, kpss_statistic, kpss_p_value, kpss_stationary),
+        'ndiffs': d nhỏ nhất mà ADF kết luận dừng (max_d nếu không có)
+    """
+    key = (series_fingerprint(timeseries), max_d)
+    cached = _stationarity_cache_get(key)
+    if cached is not None:
+        return cached
+
+    x = np.asarray(timeseries, dtype=float)
+    by_d = []
+    for d in range(max_d + 1):
+        adf_result = adfuller(x)
+        kpss_statistic, kpss_p_value, _, _ = kpss(x, regression='c', nlags='auto')
+        by_d.append({
+            'd': d,
+            'adf_statistic': adf_result[0],
+            'p_value': adf_result[1],
+            'critical_values': adf_result[4],
+            'is_stationary': adf_result[1] <= 0.05,
+            'kpss_statistic': kpss_statistic,
+            'kpss_p_value': kpss_p_value,
+            'kpss_stationary': kpss_p_value > 0.05
+        })
+        x = np.diff(x)
+
+    summary = {
+        'by_d': by_d,
+        'ndiffs': next((r['d'] for r in by_d if r['is_stationary']), max_d)
+    }
+    return _stationarity_cache_put(key, summary)
+
 def check_stationarity(timeseries):
     """
     Kiểm tra tính dừng của chuỗi thời gian bằng ADF test
+    [OPTIMIZED] Dùng lại kết quả d = 0 nếu stationarity_summary đã chạy cho chuỗi này, nếu không
+    chỉ chạy một ADF (không chạy KPSS và các bậc sai phân như stationarity_summary) và cache lại.
     """
-    result = adfuller(timeseries)
-    return {
-        'adf_statistic': result[0],
-        'p_value': result[1],
-        'critical_values': result[4],
-        'is_stationary': result[1] <= 0.05
-    }
+    fingerprint = series_fingerprint(timeseries)
+    summary = _stationarity_cache_get((fingerprint, 2))
+    if summary is not None:
+        result = summary['by_d'][0]
+        return {key: result[key] for key in ('adf_statistic', 'p_value', 'critical_values', 'is_stationary')}
+
+    key = (fingerprint, 'adf')
+    cached = _stationarity_cache_get(key)
+    if cached is not None:
+        return cached
+    adf_result = adfuller(np.asarray(timeseries, dtype=float))
+    return _stationarity_cache_put(key, {
+        'adf_statistic': adf_result[0],
+        'p_value': adf_result[1],
+        'critical_values': adf_result[4],
+        'is_stationary': adf_result[1] <= 0.05
+    })
 
-def find_optimal_arima_params(data, seasonal=False):
+class _FitTimeout(Exception):
+    pass
+
+def _raise_fit_timeout(signum, frame):
+    raise _FitTimeout()
+
+def _fit_order(data, order, maxiter=None, timeout=None, seasonal_order=(0, 0, 0, 0), cache=None):
     """
-    Tìm tham số tối ưu cho mô hình ARIMA bằng cách thử nghiệm
+    Fit ARIMA cho một order, dùng trong worker process. Không raise mà trả về dict kết quả
+    với status 'ok' / 'timeout' / 'error'.
+    timeout dùng SIGALRM nên chỉ có hiệu lực trên Unix khi fit chạy trong main thread (worker của pool,
+    script); fit tuần tự trong thread phụ (ví dụ script Streamlit với max_workers=1) không bị giới hạn thời gian.
+    maxiter: giới hạn số vòng tối ưu likelihood, dùng cho pre-fit rẻ để sàng lọc order
+    (AIC khi dừng sớm luôn >= AIC khi hội tụ).
+    cache: ArimaFitCache (optional), kết quả fit thành công được ghi vào cache
+    (tra cache được làm ở process cha, xem _map_fits).
     """
-    best_aic = float('inf')
-    best_order = None
-    
-    # Thử nghiệm các tham số p, d, q
-    for p in range(0, 4):
-        for d in range(0, 3):
-            for q in range(0, 4):
-                try:
-                    model = ARIMA(data, order=(p, d, q))
-                    fitted_model = model.fit()
-                    if fitted_model.aic < best_aic:
-                        best_aic = fitted_model.aic
-                        best_order = (p, d, q)
-                except:
-                    continue
-    
-    return best_order if best_order else (1, 1, 1)
+    key = cache.make_key(data, order, seasonal_order, maxiter=maxiter) if cache is not None else None
+
+    # Timeout bằng SIGALRM chỉ dùng được trên Unix và trong main thread của process
+    use_alarm = (timeout is not None and hasattr(signal, 'setitimer')
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_fit_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        method_kwargs = {'maxiter': maxiter} if maxiter is not None else None
+        # Chỉ cần AIC nên bỏ qua ma trận hiệp phương sai và lưu trữ đầy đủ của Kalman filter
+        fitted_model = ARIMA(data, order=order, seasonal_order=seasonal_order).fit(
+            method_kwargs=method_kwargs, cov_type='none', low_memory=True
+        )
+        result = {'aic': float(fitted_model.aic), 'status': 'ok', 'error': None}
+        if cache is not None:
+            cache.put(key, fitted_model.params, fitted_model.aic, fitted_model.param_names)
+    except _FitTimeout:
+        result = {'aic': np.nan, 'status': 'timeout', 'error': f"Quá {timeout}s"}
+    except Exception as e:
+        result = {'aic': np.nan, 'status': 'error', 'error': str(e)}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return {'order': order, 'seasonal_order': seasonal_order, **result}
+
+def css_arima_fit(data, order, n_cond=None):
+    """
+    Ước lượng ARIMA(p, d, q) bằng conditional sum of squares (CSS), dùng để sàng lọc order nhanh.
+    Phần AR tính bằng một phép nhân ma trận các lag, phần MA bằng scipy.signal.lfilter
+    (e_t = u_t - sum theta_j e_{t-j}), tối ưu bằng least_squares nên không có vòng lặp Python theo thời gian.
+    n_cond: số quan sát đầu (trên chuỗi gốc) bỏ qua khi tính tổng bình phương; dùng cùng một giá trị
+    (max_p + max_d) cho mọi order để AIC của các order dùng chung một mẫu và so sánh được với nhau.
+
+    Returns:
+        dict params (const nếu d = 0, phi, theta), sigma2, aic
+    """
+    p, d, q = order
+    n_cond = p + d if n_cond is None else max(n_cond, p + d)
+    w = np.diff(np.asarray(data, dtype=float), n=d)
+    k_trend = 1 if d == 0 else 0
+    n = len(w)
+    target = w[p:]
+    lags = np.column_stack([w[p - i:n - i] for i in range(1, p + 1)]) if p else np.empty((n - p, 0))
+    skip = n_cond - d - p
+
+    def residuals(params):
+        u = target - lags @ params[k_trend:k_trend + p]
+        if k_trend:
+            u = u - params[0]
+        if q:
+            u = lfilter([1.0], np.r_[1.0, params[k_trend + p:]], u)
+        # MA không khả nghịch làm residual bùng nổ, chặn lại để least_squares tiếp tục được
+        return np.nan_to_num(u[skip:], nan=1e10, posinf=1e10, neginf=-1e10)
+
+    x0 = np.zeros(k_trend + p + q)
+    if k_trend:
+        x0[0] = w.mean()
+    if len(x0):
+        solution = least_squares(residuals, x0, method='lm')
+        params, resid = solution.x, solution.fun
+    else:
+        params, resid = x0, residuals(x0)
+
+    n_eff = len(resid)
+    sigma2 = float(resid @ resid) / n_eff
+    llf = -0.5 * n_eff * (np.log(2 * np.pi * sigma2) + 1)
+    return {'params': params, 'sigma2': sigma2, 'aic': float(2 * (len(x0) + 1) - 2 * llf)}
+
+def _css_screen(data, orders, n_cond):
+    results = []
+    for order in orders:
+        try:
+            results.append({'order': order, 'aic': css_arima_fit(data, order, n_cond)['aic'],
+                            'status': 'ok', 'error': None})
+        except Exception as e:
+            results.append({'order': order, 'aic': np.nan, 'status': 'error', 'error': str(e)})
+    return results
+
+def _cached_fit(cache, data, order, seasonal_order, maxiter=None):
+    if cache is None:
+        return None
+    entry = cache.get(cache.make_key(data, order, seasonal_order, maxiter=maxiter))
+    if entry is None:
+        return None
+    return {'order': order, 'seasonal_order': seasonal_order, 'aic': entry['aic'], 'status': 'ok', 'error': None}
+
+def _map_fits(pool, data, orders, maxiter=None, timeout=None, seasonal_orders=None, cache=None):
+    # Tra cache ngay trong process cha, chỉ các order chưa có mới được fit (song song nếu có từ 2 order)
+    if seasonal_orders is None:
+        seasonal_orders = [(0, 0, 0, 0)] * len(orders)
+    results = [_cached_fit(cache, data, order, seasonal_order, maxiter)
+               for order, seasonal_order in zip(orders, seasonal_orders)]
+    misses = [i for i, result in enumerate(results) if result is None]
+    executor = pool.executor() if pool is not None and len(misses) > 1 else None
+    if executor is None:
+        for i in misses:
+            results[i] = _fit_order(data, orders[i], maxiter, timeout, seasonal_orders[i], cache)
+        return results
+    futures = {i: executor.submit(_fit_order, data, orders[i], maxiter, timeout, seasonal_orders[i], cache)
+               for i in misses}
+    for i, future in futures.items():
+        results[i] = future.result()
+    return results
+
+def default_fit_workers():
+    """
+    Số process mặc định cho tìm tham số ARIMA: min(4, số core - 1). Khởi động pool spawn tốn vài giây
+    mỗi process nên trên máy 1-2 core chạy tuần tự (1) nhanh hơn.
+    """
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+class _FitPool:
+    """
+    Process pool cho các fit ARIMA, chỉ được tạo ở lần đầu có order chưa nằm trong cache:
+    khởi động pool spawn tốn vài giây nên grid đã cache hết không tạo pool.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def executor(self):
+        if self._executor is None and self.max_workers > 1:
+            # statsmodels/TensorFlow trong process cha không an toàn với fork nên dùng spawn
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context('spawn'))
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+def _refit_near_best(pool, data, prefits, fits, prune_margin, timeout=None, cache=None):
+    # AIC pre-fit chỉ là cận trên nên so với AIC hội tụ tốt nhất, nới thêm chênh lệch
+    # pre-fit/hội tụ lớn nhất đã thấy; lặp lại vì các fit mới có thể làm chênh lệch tăng
+    prefit_aic = {r['order']: r['aic'] for r in prefits if r['status'] == 'ok'}
+    fits = dict(fits)
+    while True:
+        converged = {order: fit['aic'] for order, fit in fits.items() if fit['status'] == 'ok'}
+        if not converged:
+            return fits
+        best_aic = min(converged.values())
+        prefit_gap = max((prefit_aic[order] - aic for order, aic in converged.items() if order in prefit_aic),
+                         default=0.0)
+        to_fit = [order for order, aic in prefit_aic.items()
+                  if order not in fits and aic <= best_aic + prune_margin + max(prefit_gap, 0.0)]
+        if not to_fit:
+            return fits
+        fits.update({result['order']: result
+                     for result in _map_fits(pool, data, to_fit, timeout=timeout, cache=cache)})
+
+def find_optimal_arima_params(data, seasonal=False, max_workers=None, timeout=60, prune_margin=10.0,
+                              prefit_maxiter=5, p_range=range(0, 4), d_range=range(0, 3), q_range=range(0, 4),
+                              search='grid', use_cache=True, screening='mle', refine_top=5):
+    """
+    Tìm tham số tối ưu cho mô hình ARIMA bằng cách thử nghiệm song song trên process pool.
+    search='grid' (mặc định): thử mọi tổ hợp (p, d, q)
+    1. Pre-fit rẻ (chỉ prefit_maxiter vòng tối ưu) cho mọi order
+    2. Fit đầy đủ các order có AIC pre-fit trong khoảng prune_margin so với AIC pre-fit tốt nhất
+    3. Fit đầy đủ thêm các order có AIC pre-fit <= AIC hội tụ tốt nhất + prune_margin + chênh lệch
+       pre-fit/hội tụ lớn nhất đã quan sát, lặp lại cho tới khi không còn order mới
+    Mỗi fit đầy đủ bị giới hạn `timeout` giây (chỉ khi fit chạy trong main thread của process, xem _fit_order).
+    max_workers mặc định là default_fit_workers(); max_workers <= 1 fit tuần tự trong process hiện tại. Việc loại order ở bước 3 chỉ là heuristic: AIC pre-fit
+    là cận trên của AIC hội tụ, nên một order bị loại vẫn có thể hội tụ tới AIC tốt hơn nếu chênh lệch
+    của nó lớn hơn mọi chênh lệch đã quan sát. Đặt prune_margin=np.inf để fit đầy đủ mọi order.
+    screening='css': ngoài các order của bước 2 còn fit đầy đủ refine_top order có AIC CSS thấp nhất
+    (css_arima_fit, vector hóa, chạy ngay trong process hiện tại). Chỉ riêng CSS không đủ để sàng lọc:
+    nó không biểu diễn được nghiệm MA sát đường tròn đơn vị nên có thể bỏ sót order tốt nhất của 'mle'
+    (ví dụ (2,1,2) trên chuỗi VNI). Vì tập ứng viên chứa cả tập của 'mle', kết quả luôn bằng hoặc có AIC
+    tốt hơn 'mle', đổi lại tốn thêm lượt CSS và tối đa refine_top fit đầy đủ.
+    search='stepwise': tìm kiếm từng bước Hyndman-Khandakar (xem stepwise_arima_search),
+    p, q tối đa lấy theo p_range/q_range, d tối đa theo d_range.
+    use_cache: dùng cache fit trên đĩa (arima_cache) cho cả pre-fit lẫn fit đầy đủ, nên tìm lại
+    trên chuỗi không đổi chỉ cần đọc kết quả.
+
+    Returns:
+        best_order: order có AIC thấp nhất, mặc định (1, 1, 1) nếu mọi fit đều lỗi
+        aic_table: DataFrame p, d, q, prefit_aic, aic, status của tất cả order (thêm css_aic nếu screening='css')
+    """
+    if search == 'stepwise':
+        order, _, aic_table = stepwise_arima_search(
+            data, max_p=max(p_range), max_q=max(q_range), max_d=max(d_range),
+            max_workers=max_workers, timeout=timeout, use_cache=use_cache
+        )
+        return order, aic_table
+
+    data = np.asarray(data, dtype=float)
+    orders = [(p, d, q) for p in p_range for d in d_range for q in q_range]
+    max_workers = max_workers or default_fit_workers()
+
+    cache = get_default_fit_cache() if use_cache else None
+    pool = _FitPool(max_workers)
+    try:
+        prefits = _map_fits(pool, data, orders, maxiter=prefit_maxiter, timeout=timeout, cache=cache)
+        best_prefit = min((r['aic'] for r in prefits if r['status'] == 'ok'), default=np.inf)
+        # Pre-fit lỗi thì không đủ thông tin để loại, vẫn fit đầy đủ
+        to_fit = [
+            result['order'] for result in prefits
+            if result['status'] != 'ok' or result['aic'] <= best_prefit + prune_margin
+        ]
+        css_aic = {}
+        if screening == 'css':
+            css_results = _css_screen(data, orders, n_cond=max(p_range) + max(d_range))
+            css_aic = {result['order']: result['aic'] for result in css_results}
+            ranked = sorted((r for r in css_results if r['status'] == 'ok'), key=lambda r: r['aic'])
+            to_fit += [result['order'] for result in ranked[:refine_top] if result['order'] not in to_fit]
+        fits = {result['order']: result for result in _map_fits(pool, data, to_fit, timeout=timeout, cache=cache)}
+        fits.update(_refit_near_best(pool, data, prefits, fits, prune_margin, timeout, cache))
+    finally:
+        pool.shutdown()
+
+    rows = []
+    for prefit in prefits:
+        order = prefit['order']
+        fit = fits.get(order, {'aic': np.nan, 'status': 'pruned', 'error': None})
+        rows.append({
+            'p': order[0], 'd': order[1], 'q': order[2],
+            'prefit_aic': prefit['aic'],
+            **({'css_aic': css_aic.get(order, np.nan)} if screening == 'css' else {}),
+            'aic': fit['aic'],
+            'status': fit['status'],
+            'error': fit['error']
+        })
+    aic_table = pd.DataFrame(rows).sort_values('aic', na_position='last').reset_index(drop=True)
+
+    ok_fits = aic_table[aic_table['status'] == 'ok']
+    if ok_fits.empty:
+        return (1, 1, 1), aic_table
+    best = ok_fits.iloc[0]
+    return (int(best['p']), int(best['d']), int(best['q'])), aic_table
+
+def choose_differencing(series, max_d=2):
+    """
+    Chọn bậc sai phân d nhỏ nhất để chuỗi dừng theo ADF (dùng stationarity_summary đã cache).
+    """
+    return stationarity_summary(series, max_d)['ndiffs']
+
+def choose_seasonal_differencing(series, m, threshold=0.64):
+    """
+    Chọn D (0 hoặc 1) theo độ mạnh mùa vụ của STL (giống nsdiffs test='seas' của R):
+    F_s = 1 - Var(remainder) / Var(seasonal + remainder), D = 1 nếu F_s > threshold.
+    """
+    from statsmodels.tsa.seasonal import STL
 
-def train_arima_model(train_data, order=None):
+    x = np.asarray(series, dtype=float)
+    if len(x) < 2 * m:
+        return 0
+    decomposition = STL(x, period=m).fit()
+    strength = 1 - np.var(decomposition.resid) / np.var(decomposition.seasonal + decomposition.resid)
+    return int(strength > threshold)
+
+def stepwise_arima_search(data, max_p=5, max_q=5, max_d=2, d=None, seasonal=False, m=5,
+                          max_P=2, max_Q=2, D=None, max_fits=94, max_workers=None, timeout=60,
+                          use_cache=True):
+    """
+    Tìm ARIMA/SARIMA theo thuật toán stepwise của Hyndman-Khandakar:
+    1. Chọn D (mùa vụ) theo độ mạnh STL, rồi d bằng kiểm định ADF (stationarity_summary)
+    2. Fit 4 mô hình khởi đầu: (2,d,2), (0,d,0), (1,d,0), (0,d,1) (tương tự cho P, Q nếu seasonal)
+    3. Lặp: fit song song các láng giềng (p±1, q±1, P±1, Q±1 và đổi đồng thời p, q / P, Q),
+       chuyển sang láng giềng tốt nhất nếu AIC giảm, dừng khi không cải thiện hoặc hết max_fits
+
+    Returns:
+        order, seasonal_order, aic_table (các mô hình đã fit, cột 'step' là vòng lặp fit mô hình đó)
+    """
+    x = np.asarray(data, dtype=float)
+    if seasonal:
+        D = choose_seasonal_differencing(x, m) if D is None else D
+        if d is None:
+            x_seasonal = x[m:] - x[:-m] if D else x
+            d = choose_differencing(x_seasonal, max_d)
+    else:
+        m, D, max_P, max_Q = 0, 0, 0, 0
+        d = choose_differencing(x, max_d) if d is None else d
+
+    def is_valid(spec):
+        p, q, P, Q = spec
+        return 0 <= p <= max_p and 0 <= q <= max_q and 0 <= P <= max_P and 0 <= Q <= max_Q
+
+    def to_orders(spec):
+        p, q, P, Q = spec
+        return (p, d, q), ((P, D, Q, m) if seasonal else (0, 0, 0, 0))
+
+    results = {}
+    cache = get_default_fit_cache() if use_cache else None
+    max_workers = max_workers or default_fit_workers()
+    pool = _FitPool(max_workers)
+
+    def fit_specs(specs, step):
+        specs = [s for s in dict.fromkeys(specs) if is_valid(s) and s not in results]
+        specs = specs[:max(0, max_fits - len(results))]
+        orders, seasonal_orders = zip(*[to_orders(s) for s in specs]) if specs else ([], [])
+        for spec, result in zip(specs, _map_fits(pool, x, list(orders), timeout=timeout,
+                                                 seasonal_orders=list(seasonal_orders), cache=cache)):
+            results[spec] = {**result, 'step': step}
+
+    def aic_of(spec):
+        result = results.get(spec)
+        return result['aic'] if result and result['status'] == 'ok' else np.inf
+
+    try:
+        if seasonal:
+            initial = [(2, 2, 1, 1), (0, 0, 0, 0), (1, 0, 1, 0), (0, 1, 0, 1)]
+        else:
+            initial = [(2, 2, 0, 0), (0, 0, 0, 0), (1, 0, 0, 0), (0, 1, 0, 0)]
+        fit_specs(initial, step=0)
+        best = min(results, key=aic_of)
+
+        step = 1
+        while len(results) < max_fits:
+            p, q, P, Q = best
+            neighbours = [
+                (p - 1, q, P, Q), (p + 1, q, P, Q), (p, q - 1, P, Q), (p, q + 1, P, Q),
+                (p - 1, q - 1, P, Q), (p + 1, q + 1, P, Q), (p - 1, q + 1, P, Q), (p + 1, q - 1, P, Q)
+            ]
+            if seasonal:
+                neighbours += [
+                    (p, q, P - 1, Q), (p, q, P + 1, Q), (p, q, P, Q - 1), (p, q, P, Q + 1),
+                    (p, q, P - 1, Q - 1), (p, q, P + 1, Q + 1)
+                ]
+            fit_specs(neighbours, step)
+            candidate = min(neighbours, key=aic_of)
+            if aic_of(candidate) >= aic_of(best):
+                break
+            best = candidate
+            step += 1
+    finally:
+        pool.shutdown()
+
+    rows = []
+    for (p, q, P, Q), result in results.items():
+        rows.append({
+            'p': p, 'd': d, 'q': q, 'P': P, 'D': D, 'Q': Q, 'm': m,
+            'aic': result['aic'], 'status': result['status'], 'error': result['error'], 'step': result['step']
+        })
+    aic_table = pd.DataFrame(rows).sort_values('aic', na_position='last').reset_index(drop=True)
+
+    if not np.isfinite(aic_of(best)):
+        return (1, 1, 1), (0, 0, 0, 0), aic_table
+    order, seasonal_order = to_orders(best)
+    return order, seasonal_order, aic_table
+
+def train_arima_model(train_data, order=None, seasonal_order=None, use_cache=True):
     """
-    Huấn luyện mô hình ARIMA
+    Huấn luyện mô hình ARIMA (SARIMA nếu có seasonal_order)
+    [OPTIMIZED] Nếu cache đã có tham số cho cùng chuỗi + order thì chỉ chạy Kalman filter
+    với tham số đó (model.filter), không tối ưu likelihood lại.
     """
     try:
         if order is None:
             # Tự động tìm tham số tối ưu
-            order = find_optimal_arima_params(train_data)
+            order, _ = find_optimal_arima_params(train_data, use_cache=use_cache)
         
         # Huấn luyện với tham số đã cho
-        model = ARIMA(train_data, order=order)
+        seasonal_order = seasonal_order or (0, 0, 0, 0)
+        model = ARIMA(train_data, order=order, seasonal_order=seasonal_order)
+        cache = get_default_fit_cache() if use_cache else None
+        if cache is not None:
+            key = cache.make_key(train_data, order, seasonal_order)
+            entry = cache.get(key)
+            if entry is not None:
+                return model.filter(entry['params']), order
         fitted_model = model.fit()
+        if cache is not None:
+            cache.put(key, fitted_model.params, fitted_model.aic, fitted_model.param_names)
         return fitted_model, order
     except Exception as e:
         print(f"Lỗi khi huấn luyện ARIMA: {e}")
@@ -74,6 +512,26 @@ def predict_arima(model, steps):
         print(f"Lỗi khi dự đoán ARIMA: {e}")
         return None
 
+def rolling_one_step_forecast(fitted_model, test_data):
+    """
+    Dự đoán một bước (one-step-ahead) cho từng ngày của test_data mà không fit lại:
+    chỉ cập nhật Kalman filter với tham số đã fit, dự đoán ngày t dùng dữ liệu thật tới ngày t-1
+    (giống cách đánh giá LSTM/GRU trên tập test).
+    """
+    test_values = np.asarray(test_data, dtype=float).reshape(-1)
+    try:
+        # Chỉ chạy filter trên phần dữ liệu mới, bắt đầu từ trạng thái cuối của tập train
+        extended = fitted_model.extend(test_values)
+        predictions = extended.predict()
+    except ValueError:
+        # DatetimeIndex không có freq (ngày giao dịch) không mở rộng được,
+        # filter lại toàn bộ chuỗi theo chỉ số vị trí với cùng tham số
+        train_values = np.asarray(fitted_model.model.endog, dtype=float).reshape(-1)
+        full_values = np.concatenate([train_values, test_values])
+        extended = fitted_model.model.clone(full_values).filter(fitted_model.params, cov_type='none')
+        predictions = extended.predict(start=len(train_values))
+    return np.asarray(predictions)
+
 def evaluate_arima_model(y_true, y_pred):
     """
     Đánh giá hiệu suất mô hình ARIMA
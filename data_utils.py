@@ -1,3 +1,7 @@
+import os
+import pickle
+from collections import deque
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from ta.momentum import RSIIndicator
@@ -8,19 +12,123 @@ try:
 except ModuleNotFoundError:
     holidays = None
 
+try:
+    import pyarrow
+except ModuleNotFoundError:
+    pyarrow = None
+
+# Schema của kho giá: giá lưu float32, khối lượng lưu int64
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+VOLUME_COLUMN = 'Volume'
+OHLCV_COLUMNS = PRICE_COLUMNS + [VOLUME_COLUMN]
+BINARY_EXTENSION = '.parquet'
+
 # Data loading
 
-def load_data(file_path):
+def binary_store_path(file_path):
+    """
+    Đường dẫn bản nhị phân (Parquet) đi kèm file CSV, ví dụ
+    data/VNI_2020_2025_FINAL.csv -> data/VNI_2020_2025_FINAL.parquet
+    """
+    return os.path.splitext(os.fspath(file_path))[0] + BINARY_EXTENSION
+
+def normalize_ohlcv(df):
+    """
+    Kiểm tra schema OHLCV và ép kiểu cột về float32 (giá) / int64 (khối lượng).
+    Chỉ cần chạy một lần khi ghi kho nhị phân, lúc đọc lại không phải kiểm tra.
+    Dữ liệu bị sửa được báo bằng cảnh báo: ngày trùng (giữ dòng cuối, là bản crawler ghi sau cùng),
+    giá không đọc được (thành NaN) và khối lượng thiếu/không đọc được (thành 0).
+    """
+    missing_cols = [c for c in OHLCV_COLUMNS if c not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Thiếu cột bắt buộc: {missing_cols}")
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise ValueError("Index phải là cột 'Date' kiểu ngày tháng.")
+
+    # Cố ý giữ dòng cuối của mỗi ngày trùng: dữ liệu mới được nối vào cuối file
+    duplicated = df.index.duplicated(keep='last')
+    df = df[~duplicated].sort_index()
+    df.index.name = 'Date'
+    coerced_rows = np.zeros(len(df), dtype=bool)
+    for col in PRICE_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce')
+        coerced_rows |= (values.isna() & df[col].notna()).to_numpy()
+        df[col] = values.astype(np.float32)
+    volume = pd.to_numeric(df[VOLUME_COLUMN], errors='coerce')
+    filled_volume = int(volume.isna().sum())
+    df[VOLUME_COLUMN] = volume.fillna(0).astype(np.int64)
+
+    if duplicated.any():
+        print(f"⚠️ Bỏ {int(duplicated.sum())} dòng trùng ngày (giữ dòng cuối cùng của mỗi ngày)")
+    if coerced_rows.any():
+        print(f"⚠️ {int(coerced_rows.sum())} dòng có giá không đọc được, đã chuyển thành NaN")
+    if filled_volume:
+        print(f"⚠️ {filled_volume} dòng thiếu hoặc sai khối lượng, đã điền 0 (chỉ báo theo khối lượng sẽ bị ảnh hưởng)")
+    return df
+
+def save_price_store(df, binary_path):
+    """
+    Ghi DataFrame OHLCV (đã chuẩn hóa) ra Parquet dạng cột.
+    Trả về False nếu không có pyarrow để caller tiếp tục dùng CSV.
+    """
+    if pyarrow is None:
+        return False
+    tmp_path = f"{binary_path}.tmp"
+    df.to_parquet(tmp_path, engine='pyarrow', index=True)
+    # Ghi ra file tạm rồi rename để tiến trình khác không đọc phải file dở dang
+    os.replace(tmp_path, binary_path)
+    return True
+
+def _is_binary_fresh(binary_path, csv_path):
+    if pyarrow is None or not os.path.exists(binary_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(binary_path) >= os.path.getmtime(csv_path)
+
+def _with_price_dtype(df, dtype):
+    # Kho luôn lưu giá float32; chỉ đổi kiểu khi caller yêu cầu dtype khác (ví dụ float64)
+    if dtype is None:
+        return df
+    columns = {col: dtype for col in PRICE_COLUMNS if col in df.columns and df[col].dtype != dtype}
+    return df.astype(columns) if columns else df
+
+def load_data(file_path, use_binary_store=True, dtype=np.float32):
+    """
+    Tải dữ liệu OHLCV. Với đường dẫn CSV trên đĩa, ưu tiên đọc bản Parquet đi kèm
+    (nếu mới hơn CSV); nếu chưa có thì parse CSV một lần và ghi lại bản Parquet.
+    File upload (file-like) luôn được đọc trực tiếp từ CSV.
+    dtype: kiểu của các cột giá (mặc định float32 như trong kho, None để giữ nguyên);
+    khối lượng luôn là int64.
+    """
     try:
+        is_path = isinstance(file_path, (str, os.PathLike))
+        if is_path and os.fspath(file_path).endswith(BINARY_EXTENSION):
+            return _with_price_dtype(pd.read_parquet(file_path), dtype)
+
+        binary_path = binary_store_path(file_path) if (is_path and use_binary_store) else None
+        if binary_path and _is_binary_fresh(binary_path, file_path):
+            return _with_price_dtype(pd.read_parquet(binary_path), dtype)
+
         data = pd.read_csv(file_path, index_col='Date', parse_dates=True)
-        data.sort_index(inplace=True)
-        return data
+        data = normalize_ohlcv(data)
+        if binary_path:
+            try:
+                save_price_store(data, binary_path)
+            except OSError as e:
+                # Không ghi được bản nhị phân (ví dụ thư mục chỉ đọc) thì vẫn dùng CSV
+                print(f"⚠️ Không thể ghi kho nhị phân {binary_path}: {e}")
+        return _with_price_dtype(data, dtype)
     except Exception as e:
         raise RuntimeError(f"Lỗi khi tải dữ liệu: {e}")
 
 # Technical indicators
 
-def add_technical_indicators(df):
+def add_technical_indicators(df, dtype=np.float32):
+    """
+    Thêm RSI, MACD, MACD_Signal, MACD_Histogram, MA_20, MA_50.
+    Chỉ báo được tính bằng float64 rồi mới ép về `dtype` (None để giữ float64).
+    """
     df_copy = df.copy()
     df_copy['RSI'] = RSIIndicator(close=df_copy['Close'], window=14).rsi()
     macd = MACD(close=df_copy['Close'])
@@ -29,36 +137,252 @@ def add_technical_indicators(df):
     df_copy['MACD_Histogram'] = macd.macd_diff()
     df_copy['MA_20'] = df_copy['Close'].rolling(window=20).mean()
     df_copy['MA_50'] = df_copy['Close'].rolling(window=50).mean()
+    if dtype is not None:
+        df_copy[INDICATOR_COLUMNS] = df_copy[INDICATOR_COLUMNS].astype(dtype)
     return df_copy
 
+# Incremental technical indicators
+
+INDICATOR_COLUMNS = ['RSI', 'MACD', 'MACD_Signal', 'MACD_Histogram', 'MA_20', 'MA_50']
+
+class _EwmState:
+    """
+    Trạng thái EWM (adjust=False) cập nhật từng giá trị, tái hiện đúng phép tính
+    của pandas `Series.ewm(...).mean()` để kết quả khớp từng bit.
+    """
+    def __init__(self, span=None, alpha=None, min_periods=0):
+        # pandas quy đổi span/alpha về center of mass rồi mới tính lại alpha
+        com = (span - 1) / 2 if span is not None else (1 - alpha) / alpha
+        alpha = 1. / (1. + com)
+        self.old_wt_factor = 1. - alpha
+        self.new_wt = alpha
+        self.min_periods = min_periods
+        self.weighted = np.nan
+        self.old_wt = 1.
+        self.nobs = 0
+
+    def update(self, cur):
+        is_observation = cur == cur
+        self.nobs += int(is_observation)
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != cur:
+                    self.weighted = self.old_wt * self.weighted + self.new_wt * cur
+                    self.weighted /= (self.old_wt + self.new_wt)
+                self.old_wt = 1.
+        elif is_observation:
+            self.weighted = cur
+        return self.weighted if self.nobs >= self.min_periods else np.nan
+
+class _RollingMeanState:
+    """
+    Trạng thái rolling mean cửa sổ cố định: tổng Kahan cộng/trừ như
+    `Series.rolling(window).mean()` của pandas, chỉ giữ `window` giá trị gần nhất.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.sum_x = 0.
+        self.compensation_add = 0.
+        self.compensation_remove = 0.
+        self.nobs = 0
+        self.neg_ct = 0
+        self.num_consecutive_same_value = 0
+        self.prev_value = np.nan
+
+    def update(self, val):
+        if len(self.values) == self.window:
+            self._remove(self.values[0])
+        self.values.append(val)
+        self._add(val)
+        return self._mean()
+
+    def _add(self, val):
+        if val != val:
+            return
+        self.nobs += 1
+        y = val - self.compensation_add
+        t = self.sum_x + y
+        self.compensation_add = t - self.sum_x - y
+        self.sum_x = t
+        if np.signbit(val):
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.num_consecutive_same_value += 1
+        else:
+            self.num_consecutive_same_value = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        if val != val:
+            return
+        self.nobs -= 1
+        y = -val - self.compensation_remove
+        t = self.sum_x + y
+        self.compensation_remove = t - self.sum_x - y
+        self.sum_x = t
+        if np.signbit(val):
+            self.neg_ct -= 1
+
+    def _mean(self):
+        if self.nobs < self.window:
+            return np.nan
+        result = self.sum_x / self.nobs
+        if self.num_consecutive_same_value >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.
+        return result
+
+class IndicatorEngine:
+    """
+    Tính RSI, MACD (signal/histogram), MA_20, MA_50 tăng dần theo từng phiên.
+    Giữ lại bộ tích lũy Wilder/EMA và tổng cửa sổ trượt nên mỗi phiên mới chỉ tốn O(1)
+    cho mỗi chỉ báo; kết quả khớp chính xác với `add_technical_indicators`.
+    Trạng thái có thể lưu/khôi phục bằng `save`/`load` (pickle, giống scaler/config).
+    `dtype` là kiểu của cột chỉ báo đầu ra (giống tham số của `add_technical_indicators`).
+    """
+    def __init__(self, rsi_window=14, macd_fast=12, macd_slow=26, macd_signal=9, dtype=np.float32):
+        self.dtype = dtype
+        self.last_date = None
+        self.prev_close = None
+        self.rsi_up = _EwmState(alpha=1 / rsi_window, min_periods=rsi_window)
+        self.rsi_down = _EwmState(alpha=1 / rsi_window, min_periods=rsi_window)
+        self.ema_fast = _EwmState(span=macd_fast, min_periods=macd_fast)
+        self.ema_slow = _EwmState(span=macd_slow, min_periods=macd_slow)
+        self.ema_signal = _EwmState(span=macd_signal, min_periods=macd_signal)
+        self.ma_20 = _RollingMeanState(20)
+        self.ma_50 = _RollingMeanState(50)
+
+    def _step(self, close):
+        # diff tính theo dtype gốc của cột Close (giống Series.diff), sau đó mới lên float64
+        diff = np.nan if self.prev_close is None else float(close - self.prev_close)
+        self.prev_close = close
+        up = diff if diff > 0 else 0.
+        down = -(diff if diff < 0 else 0.)
+
+        emaup = self.rsi_up.update(up)
+        emadn = self.rsi_down.update(down)
+        if emadn == 0:
+            rsi = 100.
+        else:
+            rsi = 100 - (100 / (1 + emaup / emadn))
+
+        close = float(close)
+        macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        macd_signal = self.ema_signal.update(macd)
+        return (rsi, macd, macd_signal, macd - macd_signal,
+                self.ma_20.update(close), self.ma_50.update(close))
+
+    def update(self, new_bars):
+        """
+        Cập nhật trạng thái với các phiên mới (phải nằm sau phiên cuối đã xử lý).
+        Trả về bản sao `new_bars` kèm các cột chỉ báo.
+        """
+        new_bars = new_bars.sort_index()
+        if self.last_date is not None and len(new_bars) and new_bars.index[0] <= self.last_date:
+            raise ValueError(
+                f"Dữ liệu mới phải bắt đầu sau {self.last_date}, nhận được {new_bars.index[0]}."
+            )
+        closes = new_bars['Close'].to_numpy()
+        rows = [self._step(close) for close in closes]
+        result = new_bars.copy()
+        indicator_values = np.array(rows, dtype=np.float64).reshape(len(rows), len(INDICATOR_COLUMNS))
+        # Trạng thái đã pickle từ phiên bản cũ không có dtype -> giữ float64 như trước
+        dtype = getattr(self, 'dtype', np.float64)
+        if dtype is not None:
+            indicator_values = indicator_values.astype(dtype)
+        for j, col in enumerate(INDICATOR_COLUMNS):
+            result[col] = indicator_values[:, j]
+        if len(new_bars):
+            self.last_date = new_bars.index[-1]
+        return result
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            engine = pickle.load(f)
+        if not isinstance(engine, IndicatorEngine):
+            raise ValueError(f"File {path} không chứa trạng thái IndicatorEngine.")
+        return engine
+
+def append_technical_indicators(df_with_indicators, new_bars, engine):
+    """
+    Nối các phiên mới vào DataFrame đã có chỉ báo mà không tính lại toàn bộ lịch sử.
+    `engine` phải đã xử lý đúng các phiên trong `df_with_indicators`.
+    """
+    new_bars = new_bars[new_bars.index > engine.last_date] if engine.last_date is not None else new_bars
+    if new_bars.empty:
+        return df_with_indicators
+    return pd.concat([df_with_indicators, engine.update(new_bars)])
+
+# Trading calendar
+
+class TradingCalendar:
+    """
+    Lịch giao dịch Việt Nam (thứ 2-6, trừ ngày lễ) dựng sẵn thành np.busdaycalendar.
+    Dùng `get_trading_calendar` để lấy bản đã cache thay vì khởi tạo trực tiếp.
+    """
+    def __init__(self, start_year, end_year):
+        if holidays is None:
+            raise RuntimeError("Package 'holidays' not found. Please install it with `pip install holidays`.")
+        vn_holidays = holidays.Vietnam(years=range(start_year, end_year + 1))
+        self.start_year = start_year
+        self.end_year = end_year
+        self.holidays = np.array(sorted(vn_holidays.keys()), dtype='datetime64[D]')
+        self.busdaycal = np.busdaycalendar(weekmask='1111100', holidays=self.holidays)
+
+    def sessions(self, start, end):
+        """
+        Tất cả phiên giao dịch trong khoảng [start, end], dạng mảng datetime64[D].
+        """
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1, dtype='datetime64[D]')
+        return days[np.is_busday(days, busdaycal=self.busdaycal)]
+
+    def missing_sessions(self, index):
+        """
+        Các phiên giao dịch nằm giữa ngày đầu và cuối của `index` nhưng không có trong `index`.
+        """
+        present = np.unique(pd.DatetimeIndex(index).values.astype('datetime64[D]'))
+        if len(present) == 0:
+            return present
+        return np.setdiff1d(self.sessions(present[0], present[-1]), present, assume_unique=True)
+
+    def count_missing_by_month(self, index):
+        """
+        Số phiên bị thiếu theo từng tháng (key dạng 'YYYY-MM'), tính trong một lượt.
+        """
+        months, counts = np.unique(self.missing_sessions(index).astype('datetime64[M]'), return_counts=True)
+        return {str(month): int(count) for month, count in zip(months, counts)}
+
+@lru_cache(maxsize=None)
+def get_trading_calendar(start_year, end_year):
+    return TradingCalendar(start_year, end_year)
+
+def _calendar_for_index(index):
+    return get_trading_calendar(index.min().year, index.max().year)
+
 def find_missing_dates(df):
     """
     Kiểm tra ngày bị thiếu trừ thứ 7, chủ nhật và ngày lễ Việt Nam.
     Trả về danh sách các ngày bị thiếu.
     """
-    # Tạo danh sách tất cả ngày trong khoảng
-    all_dates = pd.date_range(start=df.index.min(), end=df.index.max(), freq='D')
-    # Lấy ngày lễ Việt Nam
-    if holidays is None:
-        raise RuntimeError("Package 'holidays' not found. Please install it with `pip install holidays`.")
-    vn_holidays = holidays.Vietnam()
-    # Lọc ra ngày làm việc (thứ 2-6), không phải ngày lễ và không có trong dữ liệu
-    missing = [d for d in all_dates if d.weekday() < 5 and d not in vn_holidays and d not in df.index]
-    return missing
+    if len(df.index) == 0:
+        return []
+    missing = _calendar_for_index(df.index).missing_sessions(df.index)
+    return list(pd.DatetimeIndex(missing))
 
 def count_missing_by_month(df):
     """
     Trả về dict với số ngày missing theo từng tháng (format 'YYYY-MM').
     """
-    # Lấy danh sách ngày missing
-    missing = find_missing_dates(df)
-    if not missing:
+    if len(df.index) == 0:
         return {}
-    # Chuyển thành DataFrame để nhóm
-    df_missing = pd.DataFrame({'date': missing})
-    # Tạo cột tháng
-    df_missing['month'] = df_missing['date'].dt.to_period('M')
-    # Đếm theo tháng
-    counts = df_missing.groupby('month').size()
-    # Chuyển sang dict với key là string
-    return {str(month): int(count) for month, count in counts.items()}
+    return _calendar_for_index(df.index).count_missing_by_month(df.index)
@@ -0,0 +1,134 @@
+"""
+Ensemble nhiều seed cho LSTM/GRU: huấn luyện K bản sao build_model với seed khác nhau song song
+trên process pool, sau đó ghép các thành viên thành một mô hình Keras duy nhất có đầu ra
+[batch, K, horizon]. predict_future/backtest_forecasts nhận mô hình này như mô hình thường nên
+mỗi bước dự đoán chỉ có một lần forward cho cả K thành viên và trả về trung bình ± độ lệch chuẩn.
+"""
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from runtime_config import init_pool_worker
+
+def _build_member(model_config, train_config, num_features):
+    from model_utils import build_model
+
+    return build_model(
+        model_config['model_type'],
+        train_config['time_step'],
+        num_features,
+        model_config['num_neurons'],
+        model_config['dropout_rate'],
+        model_config.get('num_hidden_layers', 2),
+        loss_fn=model_config.get('loss_fn', 'mae'),
+        learning_rate=model_config.get('learning_rate', 0.001),
+        use_batch_norm=model_config.get('use_batch_norm', False),
+        n_future=model_config.get('n_future', 1),
+        precision=model_config.get('precision')
+    )
+
+def _train_member(seed, df, features_to_use, target_column, model_config, train_config, scaler_type):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from model_utils import preprocess_data, train_model, evaluate_model
+
+    tf.keras.utils.set_random_seed(seed)
+    X_train, y_train, X_test, y_test, scaler, _ = preprocess_data(
+        df, features_to_use, target_column,
+        time_step=train_config['time_step'],
+        scaler_type=scaler_type,
+        train_ratio=train_config.get('train_ratio', 0.8),
+        n_future=model_config.get('n_future', 1)
+    )
+    model = _build_member(model_config, train_config, len(features_to_use))
+    callbacks = [EarlyStopping(monitor='val_loss', patience=train_config.get('patience', 10), restore_best_weights=True)]
+    history = train_model(model, X_train, y_train, train_config, callbacks=callbacks)
+    metrics, _, _ = evaluate_model(model, X_test, y_test, scaler, features_to_use.index(target_column))
+    return {
+        'seed': seed,
+        **metrics,
+        'epochs_trained': len(history.history['loss']),
+        # Chỉ trả về trọng số (mảng numpy) vì model Keras không pickle được qua process
+        'weights': model.get_weights()
+    }
+
+def build_stacked_ensemble(members, name='ensemble'):
+    """
+    Ghép các mô hình thành viên (cùng input shape và horizon) thành một mô hình Keras:
+    input [batch, time_step, num_features] -> output [batch, K, horizon].
+    Các thành viên dùng chung input nên cả ensemble chỉ cần một lần forward.
+    """
+    import tensorflow as tf
+
+    inputs = tf.keras.Input(shape=members[0].input_shape[1:])
+    horizon = int(members[0].output_shape[-1])
+    outputs = [
+        tf.keras.layers.Reshape((1, horizon), name=f"member_{i}_out")(member(inputs))
+        for i, member in enumerate(members)
+    ]
+    stacked = tf.keras.layers.Concatenate(axis=1, name='members')(outputs) if len(outputs) > 1 else outputs[0]
+    return tf.keras.Model(inputs, stacked, name=name)
+
+def train_ensemble(df, features_to_use, target_column, model_config, train_config, n_members=5,
+                   base_seed=42, scaler_type='minmax', max_workers=None):
+    """
+    Huấn luyện n_members bản sao mô hình với seed base_seed, base_seed + 1, ... song song
+    (mặc định số worker = min(n_members, số core), mỗi worker dùng cpu_count // max_workers thread TF).
+
+    Returns:
+        ensemble: mô hình Keras xếp chồng (xem build_stacked_ensemble)
+        report: DataFrame metrics theo từng seed, thêm dòng 'ensemble' cho trung bình các thành viên
+        scaler, scaled_data: giống preprocess_data (mọi thành viên dùng chung scaler)
+    """
+    import tensorflow as tf
+    from model_utils import preprocess_data, evaluate_model
+
+    df = df.dropna()
+    seeds = [base_seed + i for i in range(n_members)]
+    cpu_count = os.cpu_count() or 1
+    max_workers = max_workers or min(n_members, cpu_count)
+    intra_op_threads = max(1, cpu_count // max_workers)
+
+    results = []
+    # TensorFlow không an toàn với fork nên dùng spawn
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp.get_context('spawn'),
+        initializer=init_pool_worker,
+        initargs=(intra_op_threads,)
+    ) as executor:
+        futures = [
+            executor.submit(_train_member, seed, df, features_to_use, target_column,
+                            model_config, train_config, scaler_type)
+            for seed in seeds
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"✅ Seed {result['seed']}: MAE={result['MAE']:.4f} RMSE={result['RMSE']:.4f} "
+                  f"({result['epochs_trained']} epochs)")
+            results.append(result)
+    results.sort(key=lambda result: result['seed'])
+
+    # preprocess_data là tất định nên scaler ở đây trùng với scaler của từng worker
+    _, _, X_test, y_test, scaler, scaled_data = preprocess_data(
+        df, features_to_use, target_column,
+        time_step=train_config['time_step'],
+        scaler_type=scaler_type,
+        train_ratio=train_config.get('train_ratio', 0.8),
+        n_future=model_config.get('n_future', 1)
+    )
+    members = []
+    for result in results:
+        member = _build_member(model_config, train_config, len(features_to_use))
+        member.set_weights(result.pop('weights'))
+        members.append(member)
+    ensemble = build_stacked_ensemble(members, name=f"ensemble_{model_config['model_type'].lower()}_{n_members}")
+
+    ensemble_metrics, _, _ = evaluate_model(ensemble, X_test, y_test, scaler, features_to_use.index(target_column))
+    print(f"🎯 Ensemble {n_members} seed: MAE={ensemble_metrics['MAE']:.4f} RMSE={ensemble_metrics['RMSE']:.4f}")
+    report = pd.DataFrame(results).set_index('seed')
+    report.loc['ensemble', list(ensemble_metrics)] = list(ensemble_metrics.values())
+    return ensemble, report, scaler, scaled_data
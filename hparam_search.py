@@ -0,0 +1,371 @@
+"""
+Tìm siêu tham số cho LSTM/GRU quanh build_model/train_model.
+- Sampler: ngẫu nhiên hoặc TPE (Tree-structured Parzen Estimator, từng tham số độc lập)
+- Các trial chạy song song trên process pool, mỗi worker bị giới hạn số thread TensorFlow
+- Median pruning: sau n_warmup_epochs, dừng trial có val_loss kém hơn trung vị của các trial trước ở cùng epoch
+- Mọi trial và val_loss từng epoch được lưu trong SQLite nên có thể dừng rồi chạy tiếp (resume)
+"""
+import os
+import json
+import math
+import time
+import sqlite3
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import pandas as pd
+
+from runtime_config import init_pool_worker
+
+DEFAULT_STORAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'hparam_search.db')
+
+# Không gian tìm kiếm theo phạm vi các slider ở tab cấu hình mô hình:
+# ('choice', [...]), ('int', low, high, step), ('float', low, high, step), ('log', low, high)
+DEFAULT_SEARCH_SPACE = {
+    'model_type': ('choice', ['LSTM', 'GRU']),
+    'num_neurons': ('int', 32, 256, 32),
+    'dropout_rate': ('float', 0.1, 0.8, 0.05),
+    'num_hidden_layers': ('int', 1, 4, 1),
+    'batch_size': ('int', 16, 128, 16),
+    'time_step': ('int', 10, 100, 10),
+    'learning_rate': ('log', 1e-4, 1e-2)
+}
+
+FINISHED_STATES = ('COMPLETE', 'PRUNED', 'FAIL')
+
+class TrialStore:
+    """
+    CSDL trial trên SQLite, dùng chung giữa process điều phối và các worker.
+    """
+
+    def __init__(self, storage_path=DEFAULT_STORAGE_PATH, study_name='default'):
+        self.storage_path = storage_path
+        self.study_name = study_name
+        os.makedirs(os.path.dirname(os.path.abspath(storage_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trials (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    study TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    value REAL,
+                    epochs_run INTEGER,
+                    error TEXT,
+                    started REAL,
+                    finished REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trial_values (
+                    trial_id INTEGER NOT NULL,
+                    epoch INTEGER NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (trial_id, epoch)
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.storage_path, timeout=60)
+
+    def create_trial(self, params):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO trials (study, params, state, started) VALUES (?, ?, 'RUNNING', ?)",
+                (self.study_name, json.dumps(params), time.time())
+            )
+            return cursor.lastrowid
+
+    def report(self, trial_id, epoch, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO trial_values (trial_id, epoch, value) VALUES (?, ?, ?)",
+                (trial_id, epoch, float(value))
+            )
+
+    def finish(self, trial_id, state, value=None, epochs_run=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE trials SET state = ?, value = ?, epochs_run = ?, error = ?, finished = ? WHERE id = ?",
+                (state, value, epochs_run, error, time.time(), trial_id)
+            )
+
+    def mark_interrupted(self):
+        """
+        Trial còn RUNNING từ lần chạy trước (bị dừng giữa chừng) được đánh dấu FAIL khi resume.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE trials SET state = 'FAIL', error = 'Bị gián đoạn' WHERE study = ? AND state = 'RUNNING'",
+                (self.study_name,)
+            )
+
+    def trials(self, states=None):
+        query = "SELECT id, params, state, value, epochs_run, error, started, finished FROM trials WHERE study = ?"
+        args = [self.study_name]
+        if states is not None:
+            query += f" AND state IN ({', '.join('?' * len(states))})"
+            args.extend(states)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY id", args).fetchall()
+        return [{
+            'id': row[0], 'params': json.loads(row[1]), 'state': row[2], 'value': row[3],
+            'epochs_run': row[4], 'error': row[5], 'started': row[6], 'finished': row[7]
+        } for row in rows]
+
+    def should_prune(self, trial_id, epoch, value, n_startup_trials=5):
+        """
+        Median pruning: True nếu giá trị tốt nhất tới epoch này của trial kém hơn trung vị
+        giá trị tốt nhất tới cùng epoch của các trial đã xong (COMPLETE/PRUNED).
+        """
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT MIN(v.value) FROM trial_values v JOIN trials t ON t.id = v.trial_id
+                WHERE t.study = ? AND t.state IN ('COMPLETE', 'PRUNED') AND t.id != ? AND v.epoch <= ?
+                GROUP BY v.trial_id
+            """, (self.study_name, trial_id, epoch)).fetchall()
+            best_so_far = conn.execute(
+                "SELECT MIN(value) FROM trial_values WHERE trial_id = ? AND epoch <= ?", (trial_id, epoch)
+            ).fetchone()[0]
+        if len(rows) < n_startup_trials:
+            return False
+        best_so_far = value if best_so_far is None else min(best_so_far, value)
+        return best_so_far > float(np.median([row[0] for row in rows]))
+
+def _to_internal(spec, value):
+    # Không gian nội bộ liên tục dùng cho TPE: log cho 'log', giá trị gốc cho 'int'/'float'
+    return math.log(value) if spec[0] == 'log' else float(value)
+
+def _from_internal(spec, x):
+    kind = spec[0]
+    if kind == 'log':
+        return float(min(max(math.exp(x), spec[1]), spec[2]))
+    low, high, step = spec[1], spec[2], spec[3]
+    value = low + round((min(max(x, low), high) - low) / step) * step
+    value = min(value, high)
+    return int(value) if kind == 'int' else round(float(value), 10)
+
+def _bounds(spec):
+    return (math.log(spec[1]), math.log(spec[2])) if spec[0] == 'log' else (spec[1], spec[2])
+
+class RandomSampler:
+    def __init__(self, space=None, seed=None):
+        self.space = space or DEFAULT_SEARCH_SPACE
+        self.rng = np.random.default_rng(seed)
+
+    def _sample_param(self, spec):
+        if spec[0] == 'choice':
+            return spec[1][self.rng.integers(len(spec[1]))]
+        low, high = _bounds(spec)
+        return _from_internal(spec, self.rng.uniform(low, high))
+
+    def sample(self, completed_trials):
+        return {name: self._sample_param(spec) for name, spec in self.space.items()}
+
+class TPESampler(RandomSampler):
+    """
+    TPE đơn giản, mỗi tham số độc lập: chia các trial đã xong thành nhóm tốt (gamma đầu tiên theo
+    val_loss) và nhóm còn lại, ước lượng mật độ l(x), g(x) bằng Parzen (Gauss quanh từng điểm + prior đều),
+    lấy n_candidates mẫu từ l(x) và chọn mẫu có l(x)/g(x) lớn nhất.
+    Trial PRUNED chỉ có val_loss của epoch bị dừng (không so sánh được với trial chạy hết) nên được
+    coi là tệ nhất: luôn thuộc nhóm còn lại, không tham gia xếp hạng.
+    n_startup_trials trial đầu tiên lấy mẫu ngẫu nhiên.
+    """
+
+    def __init__(self, space=None, seed=None, n_startup_trials=10, gamma=0.25, n_candidates=24):
+        super().__init__(space, seed)
+        self.n_startup_trials = n_startup_trials
+        self.gamma = gamma
+        self.n_candidates = n_candidates
+
+    def _parzen(self, observations, low, high):
+        # Như hyperopt: độ rộng mỗi thành phần = khoảng cách lớn hơn tới điểm lân cận (tính cả biên),
+        # chặn trong [range / min(100, n + 1), range]; thêm một thành phần prior rộng ở giữa
+        observations = np.sort(np.asarray(observations, dtype=float))
+        span = high - low
+        if len(observations):
+            padded = np.concatenate([[low], observations, [high]])
+            sigmas = np.maximum(padded[1:-1] - padded[:-2], padded[2:] - padded[1:-1])
+            sigmas = np.clip(sigmas, span / min(100.0, len(observations) + 1), span)
+        else:
+            sigmas = np.empty(0)
+        return np.append(observations, (low + high) / 2), np.append(sigmas, span)
+
+    @staticmethod
+    def _log_density(x, centers, sigmas):
+        z = (x[:, np.newaxis] - centers) / sigmas
+        log_components = -0.5 * z ** 2 - np.log(sigmas * math.sqrt(2 * math.pi))
+        return np.logaddexp.reduce(log_components, axis=1) - math.log(len(centers))
+
+    def _sample_param_tpe(self, spec, good, bad):
+        if spec[0] == 'choice':
+            choices = spec[1]
+            good_weights = np.array([1.0 + good.count(c) for c in choices]) / (len(choices) + len(good))
+            bad_weights = np.array([1.0 + bad.count(c) for c in choices]) / (len(choices) + len(bad))
+            candidates = self.rng.choice(len(choices), size=self.n_candidates, p=good_weights)
+            best = max(candidates, key=lambda i: good_weights[i] / bad_weights[i])
+            return choices[best]
+
+        low, high = _bounds(spec)
+        good_centers, good_sigmas = self._parzen([_to_internal(spec, v) for v in good], low, high)
+        bad_centers, bad_sigmas = self._parzen([_to_internal(spec, v) for v in bad], low, high)
+        components = self.rng.integers(len(good_centers), size=self.n_candidates)
+        candidates = np.clip(self.rng.normal(good_centers[components], good_sigmas[components]), low, high)
+        scores = (self._log_density(candidates, good_centers, good_sigmas)
+                  - self._log_density(candidates, bad_centers, bad_sigmas))
+        return _from_internal(spec, candidates[np.argmax(scores)])
+
+    def sample(self, completed_trials):
+        ranked = sorted(
+            (t for t in completed_trials if t['state'] == 'COMPLETE' and t['value'] is not None),
+            key=lambda t: t['value']
+        )
+        if len(completed_trials) < self.n_startup_trials or not ranked:
+            return super().sample(completed_trials)
+        others = [t for t in completed_trials if t['state'] != 'COMPLETE' or t['value'] is None]
+        n_good = min(len(ranked), max(1, int(math.ceil(self.gamma * len(completed_trials)))))
+        good, bad = ranked[:n_good], ranked[n_good:] + others
+        return {
+            name: self._sample_param_tpe(
+                spec,
+                [t['params'][name] for t in good if name in t['params']],
+                [t['params'][name] for t in bad if name in t['params']]
+            )
+            for name, spec in self.space.items()
+        }
+
+def _run_trial(trial_id, params, storage_path, study_name, df, features_to_use, target_column,
+               base_config, seed, n_warmup_epochs, n_startup_trials):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from model_utils import preprocess_data, build_model, train_model
+
+    store = TrialStore(storage_path, study_name)
+
+    class PruningCallback(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            value = (logs or {}).get('val_loss')
+            if value is None or not np.isfinite(value):
+                return
+            store.report(trial_id, epoch, value)
+            if epoch + 1 >= n_warmup_epochs and store.should_prune(trial_id, epoch, value, n_startup_trials):
+                self.pruned = True
+                self.model.stop_training = True
+
+    try:
+        tf.keras.utils.set_random_seed(seed + trial_id)
+        X_train, y_train, _, _, _, _ = preprocess_data(
+            df, features_to_use, target_column,
+            time_step=params['time_step'],
+            scaler_type=base_config.get('scaler_type', 'minmax'),
+            train_ratio=base_config.get('train_ratio', 0.8)
+        )
+        model = build_model(
+            params['model_type'], params['time_step'], len(features_to_use),
+            params['num_neurons'], params['dropout_rate'], params['num_hidden_layers'],
+            loss_fn=base_config.get('loss_fn', 'mae'),
+            learning_rate=params['learning_rate'],
+            use_batch_norm=base_config.get('use_batch_norm', False),
+            precision=base_config.get('precision')
+        )
+        pruning = PruningCallback()
+        callbacks = [
+            EarlyStopping(monitor='val_loss', patience=base_config.get('patience', 10), restore_best_weights=True),
+            pruning
+        ]
+        history = train_model(model, X_train, y_train, {
+            'epochs': base_config.get('epochs', 50),
+            'batch_size': params['batch_size'],
+            'validation_split': base_config.get('validation_split', 0.1)
+        }, callbacks=callbacks)
+
+        val_losses = history.history.get('val_loss', [])
+        value = float(np.nanmin(val_losses)) if val_losses else None
+        state = 'PRUNED' if pruning.pruned else ('COMPLETE' if value is not None else 'FAIL')
+        store.finish(trial_id, state, value, len(history.history['loss']))
+        return {'id': trial_id, 'state': state, 'value': value}
+    except Exception as e:
+        store.finish(trial_id, 'FAIL', error=str(e))
+        return {'id': trial_id, 'state': 'FAIL', 'value': None, 'error': str(e)}
+
+def run_hparam_search(df, features_to_use, target_column, n_trials=50, sampler='tpe', space=None,
+                      study_name='default', storage_path=DEFAULT_STORAGE_PATH, base_config=None,
+                      max_workers=None, n_warmup_epochs=5, n_startup_trials=5, seed=42):
+    """
+    Chạy tìm siêu tham số cho tới khi study có đủ n_trials trial đã kết thúc (tính cả các lần chạy trước).
+    Mục tiêu là val_loss nhỏ nhất trên phần validation của tập train (không đụng tới tập test).
+
+    Args:
+        sampler: 'tpe' hoặc 'random'
+        base_config: cấu hình cố định không tìm (epochs, validation_split, loss_fn, scaler_type, train_ratio, patience)
+        max_workers: số trial chạy song song, mỗi worker dùng cpu_count // max_workers thread TF
+
+    Returns:
+        trials_df: DataFrame các trial (tham số, state, value, epochs_run)
+        best_params: tham số của trial COMPLETE có val_loss thấp nhất (None nếu chưa có)
+    """
+    space = space or DEFAULT_SEARCH_SPACE
+    base_config = base_config or {}
+    df = df.dropna()
+    store = TrialStore(storage_path, study_name)
+    store.mark_interrupted()
+
+    n_finished = len(store.trials(FINISHED_STATES))
+    # Seed phụ thuộc số trial đã có để khi resume không lặp lại đúng các điểm cũ
+    sampler_cls = TPESampler if sampler == 'tpe' else RandomSampler
+    sampler = sampler_cls(space, seed=seed + n_finished)
+
+    cpu_count = os.cpu_count() or 1
+    max_workers = max_workers or cpu_count
+    intra_op_threads = max(1, cpu_count // max_workers)
+    remaining = max(0, n_trials - n_finished)
+    print(f"🔎 Study '{study_name}': đã có {n_finished} trial, chạy thêm {remaining} trial ({max_workers} worker)")
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp.get_context('spawn'),
+        initializer=init_pool_worker,
+        initargs=(intra_op_threads,)
+    ) as executor:
+        in_flight = set()
+        launched = 0
+        while launched < remaining or in_flight:
+            # Lấy mẫu trial mới ngay khi có worker rảnh, dùng kết quả mới nhất trong CSDL
+            while launched < remaining and len(in_flight) < max_workers:
+                params = sampler.sample(store.trials(('COMPLETE', 'PRUNED')))
+                trial_id = store.create_trial(params)
+                in_flight.add(executor.submit(
+                    _run_trial, trial_id, params, storage_path, study_name, df, features_to_use,
+                    target_column, base_config, seed, n_warmup_epochs, n_startup_trials
+                ))
+                launched += 1
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                value = f"{result['value']:.6f}" if result['value'] is not None else '-'
+                print(f"{'✅' if result['state'] == 'COMPLETE' else '✂️' if result['state'] == 'PRUNED' else '❌'} "
+                      f"Trial {result['id']}: {result['state']} val_loss={value}")
+
+    return load_trials(storage_path, study_name)
+
+def load_trials(storage_path=DEFAULT_STORAGE_PATH, study_name='default'):
+    """
+    Đọc các trial của study thành DataFrame và trả về (trials_df, best_params).
+    """
+    trials = TrialStore(storage_path, study_name).trials()
+    if not trials:
+        return pd.DataFrame(), None
+    trials_df = pd.DataFrame([{
+        'id': t['id'], **t['params'], 'state': t['state'], 'value': t['value'],
+        'epochs_run': t['epochs_run'], 'error': t['error'],
+        'seconds': (t['finished'] - t['started']) if t['finished'] and t['started'] else None
+    } for t in trials]).set_index('id')
+    scored = [t for t in trials if t['state'] == 'COMPLETE' and t['value'] is not None]
+    best_params = min(scored, key=lambda t: t['value'])['params'] if scored else None
+    return trials_df, best_params
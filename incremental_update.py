@@ -0,0 +1,139 @@
+"""
+Cập nhật mô hình tăng dần sau khi crawler thêm dữ liệu mới:
+tải mô hình + scaler đã lưu gần nhất trong models/, chỉ tạo cửa sổ cho phần dữ liệu mới
+(cộng một mẫu replay từ dữ liệu cũ), fine-tune vài epoch với learning rate thấp hơn
+rồi lưu thành một phiên bản mô hình mới (cùng định dạng với tab Quản lý mô hình).
+"""
+import os
+import re
+import pickle
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+def list_saved_models(models_dir=MODELS_DIR, model_type=None, include_ensembles=False):
+    """
+    Tên các mô hình có đủ <name>.h5, <name>_scaler.pkl, <name>_config.pkl, mới nhất trước
+    (theo _model_timestamp của config đã đọc). Mô hình ensemble (config có 'ensemble_size' > 1) bị bỏ qua trừ khi include_ensembles=True
+    vì không fine-tune trực tiếp được.
+    """
+    if not os.path.isdir(models_dir):
+        return []
+    timestamps = {}
+    for file_name in os.listdir(models_dir):
+        if not file_name.endswith('.h5'):
+            continue
+        name = file_name[:-len('.h5')]
+        config_path = os.path.join(models_dir, f"{name}_config.pkl")
+        if not (os.path.exists(config_path) and os.path.exists(os.path.join(models_dir, f"{name}_scaler.pkl"))):
+            continue
+        with open(config_path, 'rb') as f:
+            config = pickle.load(f)
+        if model_type is not None and config.get('model_type') != model_type:
+            continue
+        if not include_ensembles and config.get('ensemble_size', 1) > 1:
+            continue
+        timestamps[name] = _model_timestamp(name, config, models_dir)
+    return sorted(timestamps, key=timestamps.get, reverse=True)
+
+def _model_timestamp(name, config, models_dir):
+    # Chỉ dùng để sắp xếp: ưu tiên mốc dữ liệu 'trained_until' trong config, sau đó thời điểm lưu
+    # trong tên (model_xxx_YYYYMMDD_HHMMSS), cuối cùng là mtime. Thời điểm lưu không phải mốc dữ liệu
+    # nên không dùng để quyết định phiên nào là mới.
+    if config.get('trained_until'):
+        return pd.Timestamp(config['trained_until'])
+    match = re.search(r'(\d{8})_(\d{6})$', name)
+    if match:
+        return pd.Timestamp(datetime.strptime(''.join(match.groups()), '%Y%m%d%H%M%S'))
+    return pd.Timestamp(os.path.getmtime(os.path.join(models_dir, f"{name}.h5")), unit='s')
+
+def load_saved_model(name, models_dir=MODELS_DIR):
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model as keras_load_model
+
+    model = keras_load_model(
+        os.path.join(models_dir, f"{name}.h5"),
+        custom_objects={
+            'mae': tf.keras.metrics.MeanAbsoluteError(),
+            'mse': tf.keras.metrics.MeanSquaredError()
+        }
+    )
+    with open(os.path.join(models_dir, f"{name}_scaler.pkl"), 'rb') as f:
+        scaler = pickle.load(f)
+    with open(os.path.join(models_dir, f"{name}_config.pkl"), 'rb') as f:
+        config = pickle.load(f)
+    return model, scaler, config
+
+def save_model_version(model, scaler, config, models_dir=MODELS_DIR, name=None):
+    name = name or f"model_{config['model_type'].lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    os.makedirs(models_dir, exist_ok=True)
+    model.save(os.path.join(models_dir, f"{name}.h5"))
+    with open(os.path.join(models_dir, f"{name}_scaler.pkl"), 'wb') as f:
+        pickle.dump(scaler, f)
+    with open(os.path.join(models_dir, f"{name}_config.pkl"), 'wb') as f:
+        pickle.dump(config, f)
+    return name
+
+def update_model_incremental(df, model_name=None, models_dir=MODELS_DIR, model_type=None, new_since=None,
+                             epochs=5, lr_factor=0.1, replay_size=256, seed=42):
+    """
+    Fine-tune mô hình đã lưu trên các phiên mới của df (đã có chỉ báo kỹ thuật).
+
+    Args:
+        model_name: tên mô hình gốc, mặc định là mô hình mới nhất (lọc theo model_type nếu có)
+        new_since: mốc thời gian; các phiên sau mốc này là dữ liệu mới. Mặc định lấy 'trained_until'
+            trong config (ngày của dòng train cuối); bắt buộc truyền nếu config không có
+        epochs, lr_factor, replay_size: xem model_utils.fine_tune_model
+
+    Returns:
+        (tên phiên bản mới, history) hoặc (None, None) nếu không có dữ liệu mới
+    """
+    import tensorflow as tf
+    from model_utils import create_dataset, fine_tune_model, TrainingTelemetry, telemetry_metadata, telemetry_log_path
+
+    if model_name is None:
+        saved_models = list_saved_models(models_dir, model_type)
+        if not saved_models:
+            raise FileNotFoundError(f"Không có mô hình đã lưu trong {models_dir}")
+        model_name = saved_models[0]
+    model, scaler, config = load_saved_model(model_name, models_dir)
+
+    data = df.dropna()
+    features = config['features_to_use']
+    time_step = config['time_step']
+    n_future = config.get('n_future', 1)
+    if new_since is not None:
+        trained_until = pd.Timestamp(new_since)
+    elif config.get('trained_until'):
+        trained_until = pd.Timestamp(config['trained_until'])
+    else:
+        # Thời điểm lưu/mtime không cho biết mô hình đã thấy tới dòng nào, đoán sai sẽ bỏ sót dữ liệu mới
+        raise ValueError(f"Config của {model_name} không có 'trained_until'; hãy truyền new_since "
+                         f"(ngày của dòng train cuối cùng).")
+
+    # Giữ nguyên scaler cũ vì trọng số mô hình gắn với thang đo này
+    scaled_data = scaler.transform(data[features].to_numpy(dtype=np.float32))
+    X, y = create_dataset(scaled_data, time_step, features.index(config['target_column']), n_future)
+    # Cửa sổ i có mục tiêu đầu tiên ở dòng i + time_step, là "mới" nếu dòng đó sau trained_until
+    new_start = int(np.searchsorted(data.index.values, trained_until.to_datetime64(), side='right')) - time_step
+    if new_start >= len(X):
+        print(f"ℹ️ Không có dữ liệu mới sau {trained_until.date()} cho mô hình {model_name}")
+        return None, None
+
+    tf.keras.utils.set_random_seed(seed)
+    telemetry = TrainingTelemetry(metadata=telemetry_metadata(config, source='fine_tune', parent_model=model_name))
+    history = fine_tune_model(
+        model, X, y, new_start, config,
+        replay_size=replay_size, epochs=epochs, lr_factor=lr_factor, seed=seed, callbacks=[telemetry]
+    )
+
+    new_config = dict(config)
+    new_config['trained_until'] = data.index[-1].isoformat()
+    new_config['parent_model'] = model_name
+    new_name = save_model_version(model, scaler, new_config, models_dir)
+    telemetry.save(telemetry_log_path(os.path.join(models_dir, new_name)))
+    print(f"💾 Đã lưu phiên bản mới {new_name} (từ {model_name}, dữ liệu tới {data.index[-1].date()})")
+    return new_name, history
@@ -1,5 +1,12 @@
 # Only keep model-related imports and functions
+import os
+import json
+import time
+import uuid
+from datetime import datetime
 import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import tensorflow as tf
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from tensorflow.keras.models import Sequential
@@ -7,17 +14,95 @@ from tensorflow.keras.layers import LSTM, GRU, Dense, Dropout, Input, BatchNorma
 from tensorflow.keras.optimizers import Adam
 from sklearn.preprocessing import MinMaxScaler, StandardScaler
 
+try:
+    import psutil
+except ModuleNotFoundError:
+    psutil = None
+
 
 # Data preprocessing for LSTM/GRU
-def create_dataset(dataset, time_step, target_col_index):
-    X, Y = [], []
-    for i in range(len(dataset) - time_step):
-        # Input X: Dữ liệu từ ngày t, t+1, ..., t+time_step-1  
-        X.append(dataset[i:(i + time_step), :])
-        # Target Y: Giá trị của ngày t+time_step
-        Y.append(dataset[i + time_step, target_col_index])
-    
-    return np.array(X), np.array(Y)
+def create_dataset(dataset, time_step, target_col_index, n_future=1, dtype=None):
+    """
+    Tạo cửa sổ trượt (X, Y) dưới dạng view chỉ đọc trên `dataset`, không copy dữ liệu.
+    X[i] = dataset[i:i+time_step, :], Y[i] = dataset[i+time_step, target_col_index].
+    Với n_future > 1 (dự đoán trực tiếp nhiều bước), Y[i] = dataset[i+time_step:i+time_step+n_future, target_col_index].
+    Dữ liệu chỉ được copy theo từng batch khi huấn luyện (xem WindowBatchGenerator).
+    dtype: nếu khác dtype của dataset thì ép kiểu một lần trước khi tạo view (ví dụ np.float32
+    để Keras không phải cast từng batch); None giữ nguyên.
+    """
+    dataset = np.asarray(dataset, dtype=dtype)
+    num_windows = len(dataset) - time_step - n_future + 1
+    if num_windows <= 0:
+        y_shape = (0,) if n_future == 1 else (0, n_future)
+        return (np.empty((0, time_step, dataset.shape[1]), dtype=dataset.dtype),
+                np.empty(y_shape, dtype=dataset.dtype))
+
+    # sliding_window_view trả về shape (N - time_step + 1, F, time_step) -> đổi trục thành (.., time_step, F)
+    # và chỉ giữ các cửa sổ có đủ Y phía sau
+    X = sliding_window_view(dataset, time_step, axis=0).transpose(0, 2, 1)[:num_windows]
+    targets = dataset[time_step:, target_col_index]
+    if n_future == 1:
+        Y = targets.view()
+        Y.flags.writeable = False
+    else:
+        Y = sliding_window_view(targets, n_future)[:num_windows]
+    return X, Y
+
+class WindowBatchGenerator(tf.keras.utils.PyDataset):
+    """
+    Sinh batch từ view cửa sổ trượt của create_dataset; chỉ batch hiện tại bị copy ra bộ nhớ.
+    `indices` chọn tập con các cửa sổ (ví dụ phần train/validation theo thứ tự thời gian).
+    `affine` = (x_mul, x_add, y_mul, y_add): nếu có, batch được scale ngay trên bản copy
+    (X * x_mul + x_add), cho phép nhiều fold dùng chung một view dữ liệu gốc chưa scale.
+    """
+    def __init__(self, X, y=None, batch_size=32, shuffle=False, indices=None, seed=None, affine=None, **kwargs):
+        super().__init__(**kwargs)
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.indices = np.arange(len(X)) if indices is None else np.asarray(indices)
+        self.affine = affine
+        self._rng = np.random.default_rng(seed)
+        if self.shuffle:
+            self._rng.shuffle(self.indices)
+
+    def __len__(self):
+        return int(np.ceil(len(self.indices) / self.batch_size))
+
+    def __getitem__(self, index):
+        batch_idx = self.indices[index * self.batch_size:(index + 1) * self.batch_size]
+        # Fancy indexing trên view tạo bản copy liên tục chỉ cho batch này
+        X_batch = self.X[batch_idx]
+        if self.affine is not None:
+            x_mul, x_add, y_mul, y_add = self.affine
+            X_batch *= x_mul
+            X_batch += x_add
+        if self.y is None:
+            return X_batch
+        y_batch = self.y[batch_idx]
+        if self.affine is not None:
+            y_batch = y_batch * y_mul + y_add
+        return X_batch, y_batch
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._rng.shuffle(self.indices)
+
+def make_window_generators(X, y, batch_size, validation_split=0.0, shuffle=True, indices=None, affine=None):
+    """
+    Chia cửa sổ thành train/validation theo thứ tự thời gian (giống validation_split của Keras:
+    phần cuối làm validation) và trả về hai WindowBatchGenerator.
+    indices: chỉ chia trong tập con các cửa sổ này (mặc định toàn bộ X); affine: xem WindowBatchGenerator.
+    """
+    indices = np.arange(len(X)) if indices is None else np.asarray(indices)
+    num_samples = len(indices)
+    split_at = int(np.floor(num_samples * (1.0 - validation_split)))
+    train_gen = WindowBatchGenerator(X, y, batch_size, shuffle=shuffle, indices=indices[:split_at], affine=affine)
+    val_gen = None
+    if split_at < num_samples:
+        val_gen = WindowBatchGenerator(X, y, batch_size, indices=indices[split_at:], affine=affine)
+    return train_gen, val_gen
 
 def preprocess_data(
     df, 
@@ -25,22 +110,30 @@ def preprocess_data(
     target_column, 
     time_step=50, 
     scaler_type='minmax', 
-    train_ratio=0.8
+    train_ratio=0.8,
+    n_future=1,
+    train_size=None,
+    dtype=np.float32
 ):
     """
     Chuẩn hóa và tạo tập train/test cho LSTM/GRU.
     QUAN TRỌNG: Chỉ fit scaler trên tập train để tránh data leakage.
+    n_future > 1: y gồm n_future giá trị tiếp theo (cho mô hình dự đoán trực tiếp nhiều bước).
+    train_size: số dòng train cụ thể (nếu có thì dùng thay cho train_ratio).
+    dtype: kiểu dữ liệu của scaled_data và các cửa sổ (mặc định float32, khớp với kiểu tính của Keras).
+    MinMaxScaler/StandardScaler giữ nguyên float32 nên dữ liệu không bị đẩy lên float64.
     """
     if target_column not in features_to_use:
         raise ValueError(f"Target column '{target_column}' phải có trong danh sách features.")
     if df[features_to_use].isnull().any().any():
         raise ValueError("Dữ liệu có giá trị thiếu. Hãy xử lý trước khi huấn luyện.")
 
-    data_to_scale = df[features_to_use].values
+    data_to_scale = df[features_to_use].to_numpy(dtype=dtype)
     target_col_index = features_to_use.index(target_column)
     
     # Chia dữ liệu TRƯỚC KHI scaling để tránh data leakage
-    train_size = int(len(data_to_scale) * train_ratio)
+    if train_size is None:
+        train_size = int(len(data_to_scale) * train_ratio)
     train_data_raw = data_to_scale[:train_size, :]
     test_data_raw = data_to_scale[train_size:, :]
 
@@ -53,11 +146,29 @@ def preprocess_data(
     scaled_data = np.vstack([train_data_scaled, test_data_scaled])
 
     # Sử dụng hàm create_dataset độc lập
-    X_train, y_train = create_dataset(train_data_scaled, time_step, target_col_index)
-    X_test, y_test = create_dataset(test_data_scaled, time_step, target_col_index)
+    X_train, y_train = create_dataset(train_data_scaled, time_step, target_col_index, n_future)
+    X_test, y_test = create_dataset(test_data_scaled, time_step, target_col_index, n_future)
     
     return X_train, y_train, X_test, y_test, scaler, scaled_data
 
+def training_cutoff(df, train_ratio=0.8, train_size=None):
+    """
+    Mốc thời gian (ISO) của dòng train cuối cùng, chia giống preprocess_data.
+    Ghi vào config['trained_until'] khi lưu mô hình để cập nhật tăng dần biết dữ liệu nào là mới.
+    """
+    if train_size is None:
+        train_size = int(len(df) * train_ratio)
+    return df.index[train_size - 1].isoformat()
+
+PRECISION_POLICIES = (None, 'float32', 'mixed_bfloat16', 'mixed_float16')
+
+def _make_optimizer(learning_rate, precision=None):
+    optimizer = Adam(learning_rate=learning_rate)
+    if precision == 'mixed_float16':
+        # float16 dễ underflow gradient nên cần loss scaling; bfloat16 thì không cần
+        optimizer = tf.keras.mixed_precision.LossScaleOptimizer(optimizer)
+    return optimizer
+
 def build_model(
     model_type, 
     time_step, 
@@ -67,35 +178,40 @@ def build_model(
     num_hidden_layers=2, 
     loss_fn='mae',
     learning_rate=0.001,
-    use_batch_norm=False
+    use_batch_norm=False,
+    n_future=1,
+    precision=None
 ):
     """
     Xây dựng model LSTM/GRU cho regression.
+    n_future > 1: đầu ra Dense(n_future) dự đoán trực tiếp n_future ngày trong một lần forward.
+    precision: None/'float32' (mặc định), 'mixed_bfloat16' (CPU có AVX512-BF16/AMX) hoặc
+        'mixed_float16' (GPU). Policy chỉ gán cho các layer của model này, không đổi policy toàn cục;
+        lớp Dense đầu ra luôn tính bằng float32 để loss và dự đoán ổn định.
     """
-    print(f"Building {model_type} model | Layers: {num_hidden_layers} | Neurons: {num_neurons} | Dropout: {dropout_rate} | Loss: {loss_fn} | Batch Norm: {use_batch_norm}")
+    print(f"Building {model_type} model | Layers: {num_hidden_layers} | Neurons: {num_neurons} | Dropout: {dropout_rate} | Loss: {loss_fn} | Batch Norm: {use_batch_norm} | Outputs: {n_future} | Precision: {precision or 'float32'}")
     if model_type not in ['LSTM', 'GRU']:
         raise ValueError("Model type must be either 'LSTM' or 'GRU'.")
+    if precision not in PRECISION_POLICIES:
+        raise ValueError(f"precision phải là một trong {PRECISION_POLICIES}.")
+    layer_dtype = None if precision in (None, 'float32') else precision
+    recurrent_layer = LSTM if model_type == 'LSTM' else GRU
+
     model = Sequential()
     model.add(Input(shape=(time_step, num_features)))
     for i in range(num_hidden_layers - 1):
-        if model_type == 'LSTM':
-            model.add(LSTM(num_neurons, return_sequences=True))
-        else:
-            model.add(GRU(num_neurons, return_sequences=True))
+        model.add(recurrent_layer(num_neurons, return_sequences=True, dtype=layer_dtype))
         if use_batch_norm:
-            model.add(BatchNormalization())
-        model.add(Dropout(dropout_rate))
+            model.add(BatchNormalization(dtype=layer_dtype))
+        model.add(Dropout(dropout_rate, dtype=layer_dtype))
 
-    if model_type == 'LSTM':
-        model.add(LSTM(num_neurons))
-    else:
-        model.add(GRU(num_neurons))
+    model.add(recurrent_layer(num_neurons, dtype=layer_dtype))
     if use_batch_norm:
-        model.add(BatchNormalization())
-    model.add(Dropout(dropout_rate))
-    model.add(Dense(1, activation='linear'))  # Regression nên dùng linear
+        model.add(BatchNormalization(dtype=layer_dtype))
+    model.add(Dropout(dropout_rate, dtype=layer_dtype))
+    model.add(Dense(n_future, activation='linear', dtype='float32'))  # Regression nên dùng linear
     model.compile(
-        optimizer=Adam(learning_rate=learning_rate),
+        optimizer=_make_optimizer(learning_rate, precision),
         loss=loss_fn,
         metrics=[
             tf.keras.metrics.MeanAbsoluteError(name='mae'),
@@ -104,15 +220,284 @@ def build_model(
     )
     return model
 
+# Training telemetry
+
+TELEMETRY_SUFFIX = '_telemetry.jsonl'
+
+def telemetry_log_path(model_path):
+    """
+    File log telemetry đi kèm mô hình: models/<name>.h5 (hoặc models/<name>) -> models/<name>_telemetry.jsonl
+    """
+    model_path = os.fspath(model_path)
+    base = model_path[:-len('.h5')] if model_path.endswith('.h5') else model_path
+    return base + TELEMETRY_SUFFIX
+
+def _process_rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        # Linux: trường thứ 2 của statm là số trang đang nằm trong RAM
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _process_cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+def _available_cpu_count():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+class TrainingTelemetry(tf.keras.callbacks.Callback):
+    """
+    Ghi telemetry mỗi epoch: thời gian epoch, mẫu/giây, độ trễ batch (p50/p90/p99),
+    RSS của process, mức dùng CPU của process và load average của máy.
+    Mỗi bản ghi là một dòng JSON (event = 'start' | 'epoch' | 'end'); nếu có log_path thì được ghi
+    ngay sau mỗi epoch (xem trực tiếp được khi huấn luyện chạy nền), đồng thời giữ trong `records`.
+    File log bị ghi đè khi bắt đầu huấn luyện: mỗi file chỉ chứa lần chạy cuối của mô hình.
+    samples_per_epoch được train_model tự điền; nếu không có thì ước lượng bằng số batch * batch_size.
+    """
+    def __init__(self, log_path=None, run_id=None, samples_per_epoch=None, batch_size=None, metadata=None):
+        super().__init__()
+        self.log_path = log_path
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.samples_per_epoch = samples_per_epoch
+        self.batch_size = batch_size
+        self.metadata = metadata or {}
+        self.records = []
+        self._batch_ms = []
+
+    def _emit(self, record):
+        record = {'run_id': self.run_id, 'event': record.pop('event'),
+                  'timestamp': datetime.now().isoformat(timespec='seconds'), **record}
+        self.records.append(record)
+        if self.log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            mode = 'w' if record['event'] == 'start' else 'a'
+            with open(self.log_path, mode, encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False, default=float) + '\n')
+
+    def on_train_begin(self, logs=None):
+        self._train_start = time.perf_counter()
+        self._peak_rss = _process_rss_bytes()
+        self._epoch_records = []
+        self._emit({
+            'event': 'start',
+            'cpu_count': _available_cpu_count(),
+            'intra_op_threads': tf.config.threading.get_intra_op_parallelism_threads(),
+            'inter_op_threads': tf.config.threading.get_inter_op_parallelism_threads(),
+            'tensorflow': tf.__version__,
+            **self.metadata
+        })
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._batch_ms = []
+        self._epoch_cpu_start = _process_cpu_seconds()
+        self._epoch_start = time.perf_counter()
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._batch_ms.append(1000 * (time.perf_counter() - self._batch_start))
+
+    def on_epoch_end(self, epoch, logs=None):
+        wall_seconds = time.perf_counter() - self._epoch_start
+        cpu_seconds = _process_cpu_seconds() - self._epoch_cpu_start
+        samples = self.samples_per_epoch
+        if samples is None and self.batch_size:
+            samples = len(self._batch_ms) * self.batch_size
+        rss = _process_rss_bytes()
+        self._peak_rss = max(self._peak_rss, rss)
+        batch_ms = np.array(self._batch_ms) if self._batch_ms else np.array([np.nan])
+        # cpu_percent có thể > 100 khi nhiều thread cùng chạy; cpu_utilisation chia cho số core được phép dùng
+        cpu_percent = 100 * cpu_seconds / wall_seconds if wall_seconds > 0 else np.nan
+        record = {
+            'event': 'epoch',
+            'epoch': epoch + 1,
+            # wall_seconds gồm cả validation; train_seconds chỉ tính các batch train
+            'wall_seconds': wall_seconds,
+            'train_seconds': float(np.sum(self._batch_ms)) / 1000,
+            'samples': samples,
+            'samples_per_sec': samples / wall_seconds if samples else None,
+            'batches': len(self._batch_ms),
+            'batch_ms_p50': float(np.percentile(batch_ms, 50)),
+            'batch_ms_p90': float(np.percentile(batch_ms, 90)),
+            'batch_ms_p99': float(np.percentile(batch_ms, 99)),
+            'batch_ms_max': float(batch_ms.max()),
+            'rss_mb': rss / 2**20,
+            'cpu_percent': cpu_percent,
+            'cpu_utilisation': cpu_percent / _available_cpu_count(),
+            'load_avg_1m': os.getloadavg()[0] if hasattr(os, 'getloadavg') else None,
+            **{key: float(value) for key, value in (logs or {}).items()}
+        }
+        self._epoch_records.append(record)
+        self._emit(record)
+
+    def on_train_end(self, logs=None):
+        rates = [r['samples_per_sec'] for r in self._epoch_records if r['samples_per_sec']]
+        self._emit({
+            'event': 'end',
+            'epochs': len(self._epoch_records),
+            'total_seconds': time.perf_counter() - self._train_start,
+            'mean_samples_per_sec': float(np.mean(rates)) if rates else None,
+            'peak_rss_mb': self._peak_rss / 2**20
+        })
+
+    def save(self, path):
+        """
+        Ghi toàn bộ bản ghi đã thu thập ra file JSONL (dùng khi chỉ biết tên mô hình sau khi huấn luyện).
+        """
+        write_telemetry_log(self.records, path)
+
+def telemetry_metadata(config, **extra):
+    """
+    Các tham số cấu hình ảnh hưởng tới tốc độ huấn luyện, ghi vào bản ghi 'start' để so sánh giữa các lần chạy.
+    """
+    keys = ('model_type', 'num_neurons', 'num_hidden_layers', 'time_step', 'batch_size', 'epochs',
+            'n_future', 'precision')
+    return {**{key: config[key] for key in keys if key in config}, **extra}
+
+def write_telemetry_log(records, path):
+    """
+    Ghi đè file log bằng các bản ghi của lần huấn luyện này (lưu lại cùng mô hình không nhân đôi epoch).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=float) + '\n')
+
+def load_telemetry_log(path, event='epoch'):
+    """
+    Đọc log JSONL thành DataFrame các bản ghi có event tương ứng ('epoch', 'start', 'end' hoặc None = tất cả).
+    Log cũ (ghi nối tiếp) có thể lặp bản ghi: chỉ giữ bản cuối của mỗi (run_id, event, epoch).
+    """
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    df = pd.DataFrame(records)
+    if not df.empty:
+        keys = [col for col in ('run_id', 'event', 'epoch') if col in df.columns]
+        df = df[~df[keys].astype(str).duplicated(keep='last')].reset_index(drop=True)
+    if event is not None and not df.empty:
+        df = df[df['event'] == event].dropna(axis=1, how='all').reset_index(drop=True)
+        if event == 'epoch':
+            df['epoch'] = df['epoch'].astype(int)
+    return df
+
+def _attach_sample_counts(callbacks, samples_per_epoch=None, batch_size=None):
+    # Điền số mẫu mỗi epoch cho TrainingTelemetry (Keras không truyền thông tin này vào callback)
+    for callback in callbacks or []:
+        if isinstance(callback, TrainingTelemetry):
+            if callback.samples_per_epoch is None:
+                callback.samples_per_epoch = samples_per_epoch
+            if callback.batch_size is None:
+                callback.batch_size = batch_size
+
 def train_model(model, X_train, y_train, config, callbacks=None):
     """
     Huấn luyện mô hình với các tham số và callbacks được cung cấp.
     """
-    history = model.fit(
+    # X_train là view cửa sổ trượt: stream theo batch để Keras không materialize toàn bộ tensor
+    train_gen, val_gen = make_window_generators(
         X_train, y_train,
-        epochs=config['epochs'],
         batch_size=config['batch_size'],
-        validation_split=config['validation_split'],
+        validation_split=config['validation_split']
+    )
+    _attach_sample_counts(callbacks, len(train_gen.indices), config['batch_size'])
+    history = model.fit(
+        train_gen,
+        validation_data=val_gen,
+        epochs=config['epochs'],
+        callbacks=callbacks,
+        verbose=0
+    )
+    return history
+
+def fine_tune_model(model, X, y, new_start, config, replay_size=256, epochs=5, lr_factor=0.1,
+                    seed=None, callbacks=None):
+    """
+    Warm-start: huấn luyện tiếp mô hình đã có trên các cửa sổ mới (chỉ số >= new_start) cộng một mẫu
+    replay ngẫu nhiên từ các cửa sổ cũ để mô hình không quên dữ liệu cũ.
+    Compile lại với learning rate = learning_rate gốc * lr_factor.
+    """
+    new_indices = np.arange(max(0, new_start), len(X))
+    if len(new_indices) == 0:
+        raise ValueError("Không có cửa sổ mới để fine-tune.")
+    rng = np.random.default_rng(seed)
+    old_indices = np.arange(max(0, new_start))
+    replay_indices = rng.choice(old_indices, size=min(replay_size, len(old_indices)), replace=False)
+    indices = np.concatenate([replay_indices, new_indices])
+
+    model.compile(
+        optimizer=_make_optimizer(config.get('learning_rate', 0.001) * lr_factor, config.get('precision')),
+        loss=config.get('loss_fn', 'mae'),
+        metrics=[
+            tf.keras.metrics.MeanAbsoluteError(name='mae'),
+            tf.keras.metrics.MeanSquaredError(name='mse')
+        ]
+    )
+    train_gen = WindowBatchGenerator(X, y, config['batch_size'], shuffle=True, indices=indices, seed=seed)
+    _attach_sample_counts(callbacks, len(indices), config['batch_size'])
+    history = model.fit(train_gen, epochs=epochs, callbacks=callbacks, verbose=0)
+    print(f"🔁 Fine-tune {epochs} epochs trên {len(new_indices)} cửa sổ mới + {len(replay_indices)} cửa sổ replay")
+    return history
+
+def make_streaming_dataset(data, time_step, target_col_index, batch_size,
+                           start=0, end=None, shuffle=False, cache=False, seed=None):
+    """
+    Tạo tf.data.Dataset cắt cửa sổ on-the-fly trực tiếp từ mảng 2-D đã scale,
+    gồm các cửa sổ có chỉ số bắt đầu trong [start, end). Dữ liệu được batch và prefetch
+    để chuẩn bị input song song với quá trình huấn luyện.
+    """
+    num_windows = len(data) - time_step
+    end = num_windows if end is None else min(end, num_windows)
+    if end <= start:
+        return None
+    # Cửa sổ i dùng data[i:i+time_step] và target data[i+time_step]
+    dataset = tf.keras.utils.timeseries_dataset_from_array(
+        data[start:end + time_step - 1],
+        targets=data[start + time_step:end + time_step, target_col_index],
+        sequence_length=time_step,
+        batch_size=batch_size,
+        shuffle=shuffle and not cache,
+        seed=seed
+    )
+    if cache:
+        # Cache theo thứ tự gốc rồi xáo trộn ở mức batch để mỗi epoch vẫn có thứ tự khác nhau
+        dataset = dataset.cache()
+        if shuffle:
+            num_batches = int(np.ceil((end - start) / batch_size))
+            dataset = dataset.shuffle(num_batches, seed=seed, reshuffle_each_iteration=True)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def train_model_streaming(model, data, target_col_index, config, callbacks=None):
+    """
+    Chế độ huấn luyện streaming: nhận mảng 2-D đã scale (tập train) thay vì X/y đã cắt cửa sổ.
+    Validation lấy phần cuối theo thứ tự thời gian, tỷ lệ theo config['validation_split'].
+    Đặt config['cache_dataset'] = True để cache các batch sau epoch đầu.
+    """
+    time_step = config['time_step']
+    num_windows = len(data) - time_step
+    split_at = int(np.floor(num_windows * (1.0 - config['validation_split'])))
+    cache = config.get('cache_dataset', False)
+
+    train_ds = make_streaming_dataset(
+        data, time_step, target_col_index, config['batch_size'],
+        end=split_at, shuffle=True, cache=cache
+    )
+    val_ds = make_streaming_dataset(
+        data, time_step, target_col_index, config['batch_size'],
+        start=split_at, cache=cache
+    )
+    _attach_sample_counts(callbacks, split_at, config['batch_size'])
+    history = model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=config['epochs'],
         callbacks=callbacks,
         verbose=0
     )
@@ -125,7 +510,11 @@ def evaluate_model(model, X_test, y_test, scaler, target_col_index):
     Đánh giá mô hình và thực hiện inverse transform hiệu quả cho cột mục tiêu.
     Hỗ trợ cả MinMaxScaler và StandardScaler.
     """
-    y_pred_scaled = model.predict(X_test).flatten()
+    y_pred_scaled = model.predict(WindowBatchGenerator(X_test, batch_size=256))
+    if y_pred_scaled.ndim == 3:
+        # Ensemble xếp chồng [batch, members, horizon]: đánh giá trên trung bình các thành viên
+        y_pred_scaled = y_pred_scaled.mean(axis=1)
+    y_pred_scaled = y_pred_scaled.reshape(y_test.shape)
 
     # Inverse transform đúng cho từng loại scaler
     if hasattr(scaler, 'min_'):
@@ -156,3 +545,169 @@ def evaluate_model(model, X_test, y_test, scaler, target_col_index):
         'RMSE': rmse,
         'R²': r2
     }, y_test_inv, y_pred_inv
+
+# Time-series cross-validation
+
+def time_series_cv_splits(n_samples, n_splits=5, test_size=None, gap=0, max_train_size=None):
+    """
+    Chia chỉ số dòng giống sklearn TimeSeriesSplit nhưng trả về khoảng thay vì mảng chỉ số:
+    danh sách (train_start, train_end, test_start, test_end). Train nở dần theo từng fold
+    (hoặc trượt nếu có max_train_size), gap dòng bị bỏ giữa train và test.
+    """
+    if test_size is None:
+        test_size = n_samples // (n_splits + 1)
+    first_test_start = n_samples - n_splits * test_size
+    if test_size <= 0 or first_test_start - gap <= 0:
+        raise ValueError("Không đủ dữ liệu cho số fold, kích thước test và gap đã chọn.")
+
+    splits = []
+    for fold in range(n_splits):
+        test_start = first_test_start + fold * test_size
+        train_end = test_start - gap
+        train_start = max(0, train_end - max_train_size) if max_train_size else 0
+        splits.append((train_start, train_end, test_start, test_start + test_size))
+    return splits
+
+def fit_scaler_on_range(data, start, end, scaler_type='minmax'):
+    """
+    Tạo scaler đã fit trên data[start:end] chỉ bằng thống kê min/max hoặc mean/std theo cột
+    (reduction trực tiếp trên slice, không copy dữ liệu). Kết quả giống MinMaxScaler/StandardScaler
+    .fit(data[start:end]) nên dùng được với evaluate_model và predict_future.
+    """
+    rows = data[start:end]
+    if scaler_type == 'minmax':
+        scaler = MinMaxScaler()
+        data_min = rows.min(axis=0)
+        data_max = rows.max(axis=0)
+        data_range = data_max - data_min
+        scaler.data_min_ = data_min
+        scaler.data_max_ = data_max
+        scaler.data_range_ = data_range
+        # Cột hằng số giữ thang đo 1 như sklearn
+        scaler.scale_ = 1.0 / np.where(data_range == 0, 1, data_range)
+        scaler.min_ = -data_min * scaler.scale_
+    else:
+        scaler = StandardScaler()
+        # Tích lũy float64 để mean/var của dữ liệu float32 không mất độ chính xác
+        scaler.mean_ = rows.mean(axis=0, dtype=np.float64)
+        scaler.var_ = rows.var(axis=0, dtype=np.float64)
+        scaler.scale_ = np.where(scaler.var_ == 0, 1.0, np.sqrt(scaler.var_))
+    scaler.n_features_in_ = data.shape[1]
+    scaler.n_samples_seen_ = end - start
+    return scaler
+
+def _scaler_affine(scaler, target_col_index, dtype=np.float32):
+    # Viết phép scale dưới dạng X * mul + add để WindowBatchGenerator áp dụng trên từng batch
+    if hasattr(scaler, 'min_'):
+        mul, add = scaler.scale_, scaler.min_
+    else:
+        mul = 1.0 / scaler.scale_
+        add = -scaler.mean_ * mul
+    mul, add = mul.astype(dtype), add.astype(dtype)
+    return mul, add, mul[target_col_index], add[target_col_index]
+
+def cross_validate_model(
+    df,
+    features_to_use,
+    target_column,
+    build_fn,
+    config,
+    n_splits=5,
+    scaler_type='minmax',
+    test_size=None,
+    gap=0,
+    max_train_size=None,
+    n_future=1,
+    callbacks_fn=None,
+    dtype=np.float32
+):
+    """
+    Cross-validation chuỗi thời gian (kiểu TimeSeriesSplit) trên một buffer dùng chung:
+    dữ liệu gốc chỉ được chuyển sang numpy một lần và create_dataset tạo một view cửa sổ duy nhất.
+    Mỗi fold chỉ là khoảng chỉ số vào view này; scaler fit trên các dòng train của fold
+    (fit_scaler_on_range) và được áp dụng trên từng batch nên không fold nào materialize lại dữ liệu.
+
+    Cửa sổ train nằm trọn trong [train_start, train_end); cửa sổ test có mục tiêu trong
+    [test_start, test_end) và được phép nhìn lại các dòng trước test_start (lịch sử đã biết).
+
+    Args:
+        build_fn: hàm không tham số trả về mô hình mới đã compile cho mỗi fold
+        config: cần 'time_step', 'epochs', 'batch_size', 'validation_split'
+        callbacks_fn: hàm trả về list callbacks mới cho mỗi fold (mặc định EarlyStopping
+            theo config.get('patience', 10) nếu có validation)
+
+    Returns:
+        report: DataFrame metrics theo từng fold (MAE, MSE, RMSE, R², khoảng train/test, số epoch)
+        summary: DataFrame mean/std của MAE, MSE, RMSE, R² qua các fold
+    """
+    if target_column not in features_to_use:
+        raise ValueError(f"Target column '{target_column}' phải có trong danh sách features.")
+    if df[features_to_use].isnull().any().any():
+        raise ValueError("Dữ liệu có giá trị thiếu. Hãy xử lý trước khi huấn luyện.")
+
+    time_step = config['time_step']
+    data = df[features_to_use].to_numpy(dtype=dtype)
+    target_col_index = features_to_use.index(target_column)
+    # View cửa sổ trên dữ liệu chưa scale, dùng chung cho mọi fold
+    X, y = create_dataset(data, time_step, target_col_index, n_future)
+    splits = time_series_cv_splits(len(data), n_splits, test_size, gap, max_train_size)
+    if splits[0][2] < time_step:
+        raise ValueError("Fold đầu tiên không đủ time_step dòng lịch sử trước đoạn test.")
+
+    rows = []
+    for fold, (train_start, train_end, test_start, test_end) in enumerate(splits):
+        # Cửa sổ i dùng dòng [i, i + time_step + n_future)
+        train_idx = np.arange(train_start, train_end - time_step - n_future + 1)
+        test_idx = np.arange(test_start - time_step, test_end - time_step - n_future + 1)
+        if len(train_idx) == 0 or len(test_idx) == 0:
+            raise ValueError(f"Fold {fold} không có cửa sổ train/test, hãy giảm n_splits hoặc time_step.")
+
+        scaler = fit_scaler_on_range(data, train_start, train_end, scaler_type)
+        affine = _scaler_affine(scaler, target_col_index, dtype)
+        train_gen, val_gen = make_window_generators(
+            X, y, config['batch_size'], config['validation_split'], indices=train_idx, affine=affine
+        )
+        if callbacks_fn is not None:
+            callbacks = callbacks_fn()
+        elif val_gen is not None:
+            callbacks = [tf.keras.callbacks.EarlyStopping(
+                monitor='val_loss', patience=config.get('patience', 10), restore_best_weights=True
+            )]
+        else:
+            callbacks = []
+        _attach_sample_counts(callbacks, len(train_gen.indices), config['batch_size'])
+
+        model = build_fn()
+        history = model.fit(train_gen, validation_data=val_gen, epochs=config['epochs'],
+                            callbacks=callbacks, verbose=0)
+
+        y_pred_scaled = model.predict(
+            WindowBatchGenerator(X, batch_size=256, indices=test_idx, affine=affine), verbose=0
+        )
+        if y_pred_scaled.ndim == 3:
+            y_pred_scaled = y_pred_scaled.mean(axis=1)
+        # y của view chưa scale nên đã ở thang đo gốc, chỉ cần inverse dự đoán
+        y_true = y[test_idx]
+        _, _, y_mul, y_add = affine
+        y_pred = (y_pred_scaled.reshape(y_true.shape) - y_add) / y_mul
+
+        mse = mean_squared_error(y_true, y_pred)
+        rows.append({
+            'fold': fold,
+            'train_start': train_start,
+            'train_end': train_end,
+            'test_start': test_start,
+            'test_end': test_end,
+            'MAE': mean_absolute_error(y_true, y_pred),
+            'MSE': mse,
+            'RMSE': np.sqrt(mse),
+            'R²': r2_score(y_true, y_pred),
+            'epochs_trained': len(history.history['loss'])
+        })
+        print(f"✅ Fold {fold}: train [{train_start}, {train_end}) test [{test_start}, {test_end}) "
+              f"MAE={rows[-1]['MAE']:.4f} RMSE={rows[-1]['RMSE']:.4f}")
+        del model
+
+    report = pd.DataFrame(rows).set_index('fold')
+    summary = report[['MAE', 'MSE', 'RMSE', 'R²']].agg(['mean', 'std'])
+    return report, summary
@@ -1,13 +1,196 @@
+import weakref
 import numpy as np
 import pandas as pd
-from collections import deque
+import tensorflow as tf
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
-def predict_future(model, data, time_step, n_future, scaler, num_features, target_col_index, features_to_use=None):
+# Cache các hàm rollout đã compile theo từng model để chỉ trace một lần.
+# Các tf.function chỉ giữ weakref tới model, nếu không giá trị trong cache sẽ giữ khóa của nó
+# sống mãi và model đã xóa không bao giờ được giải phóng.
+_ROLLOUT_CACHE = weakref.WeakKeyDictionary()
+
+def get_ensemble_size(model):
+    """
+    Số thành viên của mô hình ensemble xếp chồng (đầu ra [batch, members, horizon]), 1 với mô hình đơn.
+    """
+    output_shape = model.output_shape
+    return int(output_shape[1]) if len(output_shape) == 3 else 1
+
+def _member_outputs(outputs):
+    # Đưa đầu ra về dạng [batch, members, horizon]; mô hình đơn coi như ensemble 1 thành viên
+    return outputs if len(outputs.shape) == 3 else outputs[:, tf.newaxis, :]
+
+def get_rollout_fn(model, time_step, num_features, target_col_index, dtype=np.float32):
+    """
+    Trả về tf.function chạy toàn bộ vòng dự đoán tự hồi quy trong một lần thực thi graph.
+    Hàm nhận (sequence [time_step, num_features], n_future) và trả về [n_future, members] giá trị đã scale
+    (members = 1 với mô hình đơn). Với ensemble, trung bình các thành viên được đưa lại vào cửa sổ.
+    dtype: kiểu của cửa sổ đầu vào; đầu ra của model được ép về cùng kiểu trước khi đưa lại vào cửa sổ.
+    """
+    model_cache = _ROLLOUT_CACHE.setdefault(model, {})
+    model_ref = weakref.ref(model)
+    tf_dtype = tf.as_dtype(dtype)
+    key = (time_step, num_features, target_col_index, tf_dtype.name)
+    if key in model_cache:
+        return model_cache[key]
+
+    target_mask = tf.constant(np.arange(num_features) == target_col_index)
+
+    @tf.function(input_signature=[
+        tf.TensorSpec(shape=(time_step, num_features), dtype=tf_dtype),
+        tf.TensorSpec(shape=(), dtype=tf.int32)
+    ])
+    def rollout(sequence, n_future):
+        # Giữ nguyên các feature của bước cuối, chỉ thay cột mục tiêu bằng giá trị dự đoán
+        last_known_features = sequence[-1]
+        preds = tf.TensorArray(tf_dtype, size=n_future)
+
+        def body(step, window, preds):
+            member_preds = tf.cast(_member_outputs(model_ref()(window[tf.newaxis], training=False))[0, :, 0], tf_dtype)
+            next_pred = tf.reduce_mean(member_preds)
+            new_feature_vector = tf.where(target_mask, next_pred, last_known_features)
+            window = tf.concat([window[1:], new_feature_vector[tf.newaxis]], axis=0)
+            return step + 1, window, preds.write(step, member_preds)
+
+        _, _, preds = tf.while_loop(
+            lambda step, window, preds: step < n_future,
+            body,
+            [tf.constant(0), sequence, preds]
+        )
+        return preds.stack()
+
+    model_cache[key] = rollout
+    return rollout
+
+def get_step_fn(model, time_step, num_features, target_col_index, dtype=np.float32):
+    """
+    Trả về tf.function thực hiện một bước dự đoán: (window, feature đã biết cuối cùng) -> (dự đoán [members], window mới).
+    Dùng cho chế độ streaming, khi cần nhận kết quả của từng ngày ngay khi tính xong.
+    """
+    model_cache = _ROLLOUT_CACHE.setdefault(model, {})
+    model_ref = weakref.ref(model)
+    tf_dtype = tf.as_dtype(dtype)
+    key = ('step', time_step, num_features, target_col_index, tf_dtype.name)
+    if key in model_cache:
+        return model_cache[key]
+
+    target_mask = tf.constant(np.arange(num_features) == target_col_index)
+
+    @tf.function(input_signature=[
+        tf.TensorSpec(shape=(time_step, num_features), dtype=tf_dtype),
+        tf.TensorSpec(shape=(num_features,), dtype=tf_dtype)
+    ])
+    def step(window, last_known_features):
+        member_preds = tf.cast(_member_outputs(model_ref()(window[tf.newaxis], training=False))[0, :, 0], tf_dtype)
+        new_feature_vector = tf.where(target_mask, tf.reduce_mean(member_preds), last_known_features)
+        return member_preds, tf.concat([window[1:], new_feature_vector[tf.newaxis]], axis=0)
+
+    model_cache[key] = step
+    return step
+
+def _inverse_transform_target(scaler, values_scaled, num_features, target_col_index):
+    # Tạo dummy array để inverse transform
+    values_scaled = np.asarray(values_scaled).reshape(-1)
+    dummy_preds = np.zeros((len(values_scaled), num_features))
+    dummy_preds[:, target_col_index] = values_scaled
+    return scaler.inverse_transform(dummy_preds)[:, target_col_index]
+
+def get_batch_rollout_fn(model, time_step, num_features, target_col_index, dtype=np.float32):
+    """
+    Giống get_rollout_fn nhưng chạy đồng thời cho nhiều điểm gốc (origin):
+    nhận batch [origins, time_step, num_features], mỗi bước horizon chỉ gọi model một lần cho cả batch.
+    Trả về tensor [origins, n_future] đã scale (trung bình các thành viên nếu là ensemble).
+    """
+    model_cache = _ROLLOUT_CACHE.setdefault(model, {})
+    model_ref = weakref.ref(model)
+    tf_dtype = tf.as_dtype(dtype)
+    key = ('batch', time_step, num_features, target_col_index, tf_dtype.name)
+    if key in model_cache:
+        return model_cache[key]
+
+    target_mask = tf.constant(np.arange(num_features) == target_col_index)
+
+    @tf.function(input_signature=[
+        tf.TensorSpec(shape=(None, time_step, num_features), dtype=tf_dtype),
+        tf.TensorSpec(shape=(), dtype=tf.int32)
+    ])
+    def rollout(windows, n_future):
+        last_known_features = windows[:, -1, :]
+        preds = tf.TensorArray(tf_dtype, size=n_future)
+
+        def body(step, windows, preds):
+            next_pred = tf.cast(tf.reduce_mean(_member_outputs(model_ref()(windows, training=False))[:, :, 0], axis=1), tf_dtype)
+            new_feature_vectors = tf.where(target_mask, next_pred[:, tf.newaxis], last_known_features)
+            windows = tf.concat([windows[:, 1:], new_feature_vectors[:, tf.newaxis]], axis=1)
+            return step + 1, windows, preds.write(step, next_pred)
+
+        _, _, preds = tf.while_loop(
+            lambda step, windows, preds: step < n_future,
+            body,
+            [tf.constant(0), windows, preds]
+        )
+        return tf.transpose(preds.stack())
+
+    model_cache[key] = rollout
+    return rollout
+
+def get_output_horizon(model):
+    """
+    Số bước mô hình dự đoán trực tiếp trong một lần forward (1 với mô hình đệ quy thông thường).
+    """
+    return int(model.output_shape[-1])
+
+def _predict_direct_members(model, data, time_step, n_future, scaler, num_features, target_col_index, dtype=np.float32):
+    horizon = get_output_horizon(model)
+    if n_future > horizon:
+        raise ValueError(f"Mô hình chỉ dự đoán trực tiếp tối đa {horizon} ngày, yêu cầu {n_future} ngày.")
+    last_sequence = np.asarray(data[-time_step:], dtype=dtype)[np.newaxis]
+    # [members, n_future] -> [n_future, members]
+    preds_scaled = _member_outputs(model(last_sequence, training=False)).numpy()[0, :, :n_future].T
+    return _inverse_transform_target(scaler, preds_scaled, num_features, target_col_index).reshape(preds_scaled.shape)
+
+def predict_direct(model, data, time_step, n_future, scaler, num_features, target_col_index, dtype=np.float32):
+    """
+    Dự đoán n_future ngày bằng một lần forward của mô hình đầu ra Dense(n_future),
+    không feedback dự đoán vào cửa sổ nên sai số không bị tích lũy.
+    """
+    return _predict_direct_members(
+        model, data, time_step, n_future, scaler, num_features, target_col_index, dtype
+    ).mean(axis=1)
+
+def _iter_member_predictions(model, data, time_step, n_future, scaler, num_features, target_col_index, dtype=np.float32):
+    # Yield mảng [members] đã inverse transform cho từng ngày
+    if get_output_horizon(model) > 1:
+        yield from _predict_direct_members(model, data, time_step, n_future, scaler, num_features, target_col_index, dtype)
+        return
+
+    window = tf.constant(np.asarray(data[-time_step:], dtype=dtype))
+    last_known_features = window[-1]
+    step = get_step_fn(model, time_step, num_features, target_col_index, dtype)
+    for _ in range(n_future):
+        member_preds_scaled, window = step(window, last_known_features)
+        yield _inverse_transform_target(scaler, member_preds_scaled.numpy(), num_features, target_col_index)
+
+def iter_predict_future(model, data, time_step, n_future, scaler, num_features, target_col_index, features_to_use=None,
+                        dtype=np.float32):
+    """
+    Generator dự đoán tuần tự: yield giá trị (đã inverse transform) của từng ngày ngay khi
+    tính xong. Tổng cộng chỉ n_future bước model, phù hợp để cập nhật progress bar.
+    Với ensemble, giá trị là trung bình các thành viên.
+    """
+    for member_preds in _iter_member_predictions(
+            model, data, time_step, n_future, scaler, num_features, target_col_index, dtype):
+        yield member_preds.mean()
+
+def predict_future(model, data, time_step, n_future, scaler, num_features, target_col_index, features_to_use=None, on_step=None,
+                   dtype=np.float32, return_spread=False):
     """
     Dự đoán giá trị tương lai cho n_future bước tiếp theo.
     [REFACTOR] Phiên bản này giữ nguyên các feature khác để tránh sai số tích lũy.
-    [OPTIMIZED] Sử dụng deque cho sliding window efficiency.
-    
+    [OPTIMIZED] Toàn bộ vòng lặp tự hồi quy chạy trong một tf.function (tf.while_loop),
+    thay vì gọi model.predict cho từng bước.
+
     Args:
         model: Trained model
         data: Scaled data array
@@ -17,49 +200,101 @@ def predict_future(model, data, time_step, n_future, scaler, num_features, targe
         num_features: Number of features
         target_col_index: Index of target column
         features_to_use: List of feature names (optional, for compatibility)
+        on_step: Callback on_step(step, value) gọi sau mỗi ngày dự đoán (optional)
+        dtype: Kiểu dữ liệu của cửa sổ đưa vào mô hình (mặc định float32 như khi huấn luyện)
+        return_spread: True thì trả về (trung bình, độ lệch chuẩn giữa các thành viên ensemble);
+            mô hình đơn có độ lệch chuẩn bằng 0
     """
-    # Lấy chuỗi dữ liệu cuối cùng
-    last_sequence = data[-time_step:]
-    future_preds_scaled = []
-
-    # [REFACTOR] Lấy các feature từ bước thời gian cuối cùng và giữ nguyên
-    last_known_features = last_sequence[-1, :].copy()
-
-    # [OPTIMIZED] Sử dụng deque cho sliding window thay vì np.append
-    # Initialize deque with the last sequence for efficient sliding window
-    sequence_deque = deque(last_sequence, maxlen=time_step)
-
-    for step in range(n_future):
-        # Convert deque to numpy array for model prediction
-        current_sequence = np.array(sequence_deque).reshape(1, time_step, num_features)
-        
-        # Dự đoán bước tiếp theo
-        next_pred_scaled = model.predict(current_sequence, verbose=0)[0][0]
-        future_preds_scaled.append(next_pred_scaled)
-
-        # [REFACTOR] Tạo vector feature mới
-        # Bắt đầu với các feature đã biết cuối cùng
-        new_feature_vector = last_known_features.copy()
-        # Chỉ cập nhật giá trị dự đoán mới vào cột mục tiêu
-        new_feature_vector[target_col_index] = next_pred_scaled
-        
-        # [REFACTOR] Không cần update_technical_indicators nữa
-        # Giữ nguyên các feature khác để tránh sai số tích lũy
-
-        # [OPTIMIZED] Cập nhật sliding window bằng deque - O(1) operation
-        # Automatically removes oldest element when maxlen is reached
-        sequence_deque.append(new_feature_vector)
-
-    # Inverse transform các dự đoán
-    future_preds_scaled = np.array(future_preds_scaled).reshape(-1, 1)
+    if get_output_horizon(model) > 1:
+        # Mô hình multi-output: một lần forward cho toàn bộ horizon
+        member_preds_inv = _predict_direct_members(model, data, time_step, n_future, scaler, num_features, target_col_index, dtype)
+        if on_step is not None:
+            for step, member_preds in enumerate(member_preds_inv):
+                on_step(step, member_preds.mean())
+    elif on_step is not None:
+        # Chế độ streaming: báo kết quả từng ngày qua callback
+        member_preds_inv = []
+        for step, member_preds in enumerate(_iter_member_predictions(
+                model, data, time_step, n_future, scaler, num_features, target_col_index, dtype)):
+            member_preds_inv.append(member_preds)
+            on_step(step, member_preds.mean())
+        member_preds_inv = np.array(member_preds_inv)
+    else:
+        # Lấy chuỗi dữ liệu cuối cùng
+        last_sequence = np.asarray(data[-time_step:], dtype=dtype)
 
-    # Tạo dummy array để inverse transform
-    dummy_preds = np.zeros((len(future_preds_scaled), num_features))
-    dummy_preds[:, target_col_index] = future_preds_scaled.flatten()
-    future_preds_inv = scaler.inverse_transform(dummy_preds)[:, target_col_index]
+        rollout = get_rollout_fn(model, time_step, num_features, target_col_index, dtype)
+        member_preds_scaled = rollout(last_sequence, tf.constant(n_future, dtype=tf.int32)).numpy()
+
+        # Inverse transform các dự đoán
+        member_preds_inv = _inverse_transform_target(
+            scaler, member_preds_scaled, num_features, target_col_index
+        ).reshape(member_preds_scaled.shape)
+
+    # [n_future, members]: mô hình đơn chỉ có một cột nên trung bình chính là dự đoán
+    future_preds_inv = member_preds_inv.mean(axis=1)
+    future_preds_std = member_preds_inv.std(axis=1)
 
     # In kết quả cuối cùng với format đẹp
-    formatted_preds = [f"{pred:.2f}" for pred in future_preds_inv]
+    if member_preds_inv.shape[1] > 1:
+        formatted_preds = [f"{pred:.2f}±{std:.2f}" for pred, std in zip(future_preds_inv, future_preds_std)]
+    else:
+        formatted_preds = [f"{pred:.2f}" for pred in future_preds_inv]
     print(f"🔮 Dự đoán {n_future} ngày tiếp theo: [{', '.join(formatted_preds)}]")
-    
-    return future_preds_inv
\ No newline at end of file
+
+    if return_spread:
+        return future_preds_inv, future_preds_std
+    return future_preds_inv
+
+def backtest_forecasts(model, data, time_step, n_future, scaler, num_features, target_col_index,
+                       start=None, batch_size=1024, dtype=np.float32):
+    """
+    Backtest rolling-origin: dự đoán n_future ngày từ mọi điểm gốc o trong [start, len(data) - n_future],
+    mỗi gốc dùng cửa sổ data[o-time_step:o]. Tất cả gốc được xếp thành batch
+    [origins, time_step, num_features] và cùng tiến từng bước horizon.
+
+    Returns:
+        metrics_df: DataFrame MAE/MSE/RMSE/R² cho từng horizon (giống evaluate_model)
+        y_true_inv, y_pred_inv: mảng [origins, n_future] đã inverse transform
+    """
+    data = np.asarray(data, dtype=dtype)
+    start = time_step if start is None else max(start, time_step)
+    num_origins = len(data) - n_future - start + 1
+    if num_origins <= 0:
+        raise ValueError("Không đủ dữ liệu để backtest với start và n_future đã chọn.")
+
+    # View cửa sổ trượt: windows_view[o - time_step] = data[o-time_step:o]
+    windows_view = sliding_window_view(data, time_step, axis=0).transpose(0, 2, 1)
+    origins = np.arange(start, start + num_origins)
+    direct = get_output_horizon(model) > 1
+    if direct and n_future > get_output_horizon(model):
+        raise ValueError(f"Mô hình chỉ dự đoán trực tiếp tối đa {get_output_horizon(model)} ngày.")
+    rollout = None if direct else get_batch_rollout_fn(model, time_step, num_features, target_col_index, dtype)
+
+    preds_scaled = []
+    for chunk_start in range(0, num_origins, batch_size):
+        chunk = origins[chunk_start:chunk_start + batch_size]
+        # Chỉ copy cửa sổ của chunk hiện tại
+        windows = windows_view[chunk - time_step]
+        if direct:
+            preds_scaled.append(_member_outputs(model(windows, training=False)).numpy().mean(axis=1)[:, :n_future])
+        else:
+            preds_scaled.append(rollout(windows, tf.constant(n_future, dtype=tf.int32)).numpy())
+    preds_scaled = np.concatenate(preds_scaled)
+
+    y_true_scaled = sliding_window_view(data[:, target_col_index], n_future)[origins]
+    y_pred_inv = _inverse_transform_target(scaler, preds_scaled, num_features, target_col_index).reshape(preds_scaled.shape)
+    y_true_inv = _inverse_transform_target(scaler, y_true_scaled, num_features, target_col_index).reshape(y_true_scaled.shape)
+
+    rows = []
+    for h in range(n_future):
+        mse = mean_squared_error(y_true_inv[:, h], y_pred_inv[:, h])
+        rows.append({
+            'Horizon': h + 1,
+            'MAE': mean_absolute_error(y_true_inv[:, h], y_pred_inv[:, h]),
+            'MSE': mse,
+            'RMSE': np.sqrt(mse),
+            'R²': r2_score(y_true_inv[:, h], y_pred_inv[:, h])
+        })
+    metrics_df = pd.DataFrame(rows).set_index('Horizon')
+    return metrics_df, y_true_inv, y_pred_inv
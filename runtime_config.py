@@ -0,0 +1,255 @@
+"""
+Cấu hình thực thi TensorFlow trên CPU theo các profile đặt tên sẵn:
+- latency: một request dự đoán (batch 1), tối đa LATENCY_MAX_THREADS core được gắn cố định, không chạy
+  nhiều op song song, thread OpenMP nhả CPU gần như ngay (op nhỏ, chia nhiều thread chỉ tốn đồng bộ)
+- throughput: huấn luyện theo batch, mọi core cho từng op, 2 luồng inter-op, thread OpenMP chờ lâu hơn
+  giữa các op để batch kế tiếp không phải đánh thức lại thread
+- shared: nhiều worker TF trên cùng một máy, mỗi worker chỉ dùng phần core của mình
+Mỗi profile đặt kích thước thread pool của TF, biến môi trường oneDNN/OpenMP và CPU affinity
+của process. Trên máy có <= LATENCY_MAX_THREADS core, latency và throughput chỉ khác nhau ở
+inter-op và biến OpenMP. Biến môi trường chỉ có tác dụng nếu apply_profile được gọi trước khi import
+TensorFlow; thread pool phải được đặt trước khi TF chạy op đầu tiên.
+"""
+import os
+import time
+import contextlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+LATENCY_MAX_THREADS = 4
+
+EXECUTION_PROFILES = {
+    'latency': {
+        'inter_op_threads': 1,
+        'env': {'TF_ENABLE_ONEDNN_OPTS': '1', 'KMP_BLOCKTIME': '0'}
+    },
+    'throughput': {
+        'inter_op_threads': 2,
+        'env': {'TF_ENABLE_ONEDNN_OPTS': '1', 'KMP_BLOCKTIME': '30',
+                'KMP_AFFINITY': 'granularity=fine,compact,1,0'}
+    },
+    'shared': {
+        'inter_op_threads': 1,
+        # Thread rảnh nhả CPU ngay để không tranh core với worker khác
+        'env': {'TF_ENABLE_ONEDNN_OPTS': '1', 'KMP_BLOCKTIME': '0'}
+    }
+}
+
+# Process con thừa kế biến môi trường và affinity của process cha. Hai biến đánh dấu này ghi lại
+# các biến môi trường do profile đặt (để process con ghi đè được, còn biến người dùng tự đặt thì giữ)
+# và tập CPU trước khi profile đầu tiên thu hẹp affinity (để process con tính lại từ đầu).
+_PROFILE_ENV_MARKER = '_TF_PROFILE_ENV_KEYS'
+_PROFILE_CPUS_MARKER = '_TF_PROFILE_BASE_CPUS'
+
+_active_profile = None
+
+def available_cpus():
+    """
+    Danh sách CPU process hiện tại được phép chạy (tôn trọng taskset/cgroup nếu có), tính trước khi
+    bất kỳ profile nào (kể cả của process cha) thu hẹp affinity.
+    """
+    if os.environ.get(_PROFILE_CPUS_MARKER):
+        return [int(cpu) for cpu in os.environ[_PROFILE_CPUS_MARKER].split(',')]
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _apply_env(env):
+    # Giữ giá trị người dùng tự đặt, ghi đè giá trị do profile (của process này hoặc process cha) đặt
+    profile_keys = set(filter(None, os.environ.get(_PROFILE_ENV_MARKER, '').split(',')))
+    for key, value in env.items():
+        if key in os.environ and key not in profile_keys:
+            continue
+        os.environ[key] = value
+        profile_keys.add(key)
+    os.environ[_PROFILE_ENV_MARKER] = ','.join(sorted(profile_keys))
+
+def profile_settings(name, n_workers=1, worker_index=None, intra_op_threads=None):
+    """
+    Tính cấu hình cụ thể của profile trên máy hiện tại, chưa áp dụng gì.
+
+    Args:
+        n_workers: số process TF chạy đồng thời trên máy (chỉ dùng cho 'shared')
+        worker_index: vị trí của process này trong n_workers; nếu có thì process được
+            gắn vào đúng phần core của nó, nếu None thì không đổi affinity
+        intra_op_threads: ghi đè số thread intra-op tính tự động
+
+    Returns:
+        dict {'profile', 'intra_op_threads', 'inter_op_threads', 'cpus', 'env'}
+    """
+    if name not in EXECUTION_PROFILES:
+        raise ValueError(f"Profile '{name}' không hợp lệ, chọn một trong {list(EXECUTION_PROFILES)}.")
+    profile = EXECUTION_PROFILES[name]
+    cpus = available_cpus()
+
+    if name == 'shared':
+        n_workers = max(1, n_workers)
+        per_worker = max(1, len(cpus) // n_workers)
+        if worker_index is not None:
+            start = (worker_index % n_workers) * per_worker
+            cpus = cpus[start:start + per_worker] or cpus[-per_worker:]
+        intra = per_worker
+    elif name == 'latency':
+        intra = min(len(cpus), LATENCY_MAX_THREADS)
+        cpus = cpus[:intra]
+    else:
+        intra = len(cpus)
+    intra = intra_op_threads or intra
+
+    env = dict(profile['env'])
+    env['OMP_NUM_THREADS'] = str(intra)
+    return {
+        'profile': name,
+        'intra_op_threads': intra,
+        'inter_op_threads': profile['inter_op_threads'],
+        'cpus': cpus,
+        'env': env
+    }
+
+def apply_profile(name, n_workers=1, worker_index=None, intra_op_threads=None):
+    """
+    Áp dụng profile cho process hiện tại (gọi càng sớm càng tốt, lý tưởng là trước khi import TF).
+    Gọi lại với cùng profile thì không làm gì (Streamlit chạy lại app.py mỗi lần tương tác).
+    Biến môi trường người dùng đặt sẵn được giữ nguyên; giá trị do profile khác đặt (kể cả profile
+    của process cha, ví dụ app.py 'latency' khởi động worker 'shared') thì bị ghi đè.
+
+    Returns:
+        dict cấu hình đã áp dụng (xem profile_settings)
+    """
+    global _active_profile
+    settings = profile_settings(name, n_workers, worker_index, intra_op_threads)
+    if _active_profile is not None and _active_profile == settings:
+        return _active_profile
+
+    _apply_env(settings['env'])
+    if hasattr(os, 'sched_setaffinity'):
+        os.environ.setdefault(_PROFILE_CPUS_MARKER, ','.join(str(cpu) for cpu in available_cpus()))
+        os.sched_setaffinity(0, settings['cpus'])
+
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(settings['intra_op_threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(settings['inter_op_threads'])
+    except RuntimeError:
+        # TF đã khởi tạo runtime, thread pool không đổi được nữa
+        print(f"⚠️ TensorFlow đã khởi tạo, không áp dụng được thread pool của profile '{name}'")
+        return settings
+
+    _active_profile = settings
+    print(f"⚙️ Profile '{name}': intra_op={settings['intra_op_threads']}, "
+          f"inter_op={settings['inter_op_threads']}, CPU {settings['cpus'][0]}-{settings['cpus'][-1]}")
+    return settings
+
+def get_active_profile():
+    return _active_profile
+
+def init_pool_worker(intra_op_threads):
+    """
+    Initializer cho ProcessPoolExecutor chạy TF song song (walk-forward, ensemble, tìm siêu tham số):
+    áp dụng profile 'shared' với intra_op_threads thread để tổng số thread không vượt quá số core.
+    """
+    apply_profile('shared', intra_op_threads=intra_op_threads)
+
+# Benchmark
+
+BENCHMARK_FEATURES = ['Close', 'Volume', 'RSI', 'MACD']
+
+def _benchmark_worker(name, n_workers, worker_index, data_path, time_step, epochs, n_future, repeats):
+    # Chạy trong process mới (spawn) nên profile được áp dụng trước khi TF khởi tạo
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        settings = apply_profile(name, n_workers, worker_index)
+
+    import tensorflow as tf
+    from data_utils import load_data, add_technical_indicators
+    from model_utils import preprocess_data, build_model, train_model
+    from predict_future import predict_future
+
+    tf.keras.utils.set_random_seed(42 + worker_index)
+    data = add_technical_indicators(load_data(data_path)).dropna()
+    X_train, y_train, _, _, scaler, scaled_data = preprocess_data(
+        data, BENCHMARK_FEATURES, 'Close', time_step=time_step
+    )
+    epoch_starts, epoch_seconds = [], []
+    callback = tf.keras.callbacks.LambdaCallback(
+        on_epoch_begin=lambda epoch, logs: epoch_starts.append(time.perf_counter()),
+        on_epoch_end=lambda epoch, logs: epoch_seconds.append(time.perf_counter() - epoch_starts[-1])
+    )
+    train_config = {'epochs': epochs, 'batch_size': 32, 'validation_split': 0.1}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        model = build_model('LSTM', time_step, len(BENCHMARK_FEATURES), 64, 0.2, 2)
+        train_model(model, X_train, y_train, train_config, callbacks=[callback])
+
+        # Lần gọi đầu tiên trace tf.function nên không tính
+        args = (model, scaled_data, time_step, n_future, scaler, len(BENCHMARK_FEATURES), 0)
+        predict_future(*args)
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            predict_future(*args)
+            latencies.append(time.perf_counter() - start)
+
+    # Epoch đầu gồm cả thời gian trace graph, chỉ tính các epoch sau (nếu có)
+    epoch_seconds = epoch_seconds[1:] or epoch_seconds
+    n_train = int(len(X_train) * (1 - train_config['validation_split']))
+    return {
+        'profile': name,
+        'worker': worker_index,
+        'intra_op_threads': settings['intra_op_threads'],
+        'inter_op_threads': settings['inter_op_threads'],
+        'epoch_seconds': float(np.median(epoch_seconds)),
+        'samples_per_sec': n_train / float(np.median(epoch_seconds)),
+        'predict_ms': 1000 * float(np.median(latencies))
+    }
+
+def benchmark_profiles(data_path, profiles=('latency', 'throughput', 'shared'), shared_workers=2,
+                       time_step=50, epochs=3, n_future=20, repeats=10):
+    """
+    Đo thời gian một epoch train_model và độ trễ predict_future cho từng profile trên máy hiện tại.
+    Mỗi profile chạy trong process mới; 'shared' chạy đồng thời shared_workers process
+    (mỗi process gắn vào phần core riêng) để đo đúng tình huống nhiều worker.
+
+    Returns:
+        DataFrame theo profile: intra/inter_op_threads, epoch_seconds, predict_ms và
+        total_samples_per_sec (tổng thông lượng huấn luyện của mọi worker chạy đồng thời)
+    """
+    rows = []
+    for name in profiles:
+        n_workers = shared_workers if name == 'shared' else 1
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context('spawn')) as executor:
+            futures = [
+                executor.submit(_benchmark_worker, name, n_workers, worker_index, data_path,
+                                time_step, epochs, n_future, repeats)
+                for worker_index in range(n_workers)
+            ]
+            results = [future.result() for future in futures]
+        row = {
+            'profile': name,
+            'workers': n_workers,
+            'intra_op_threads': results[0]['intra_op_threads'],
+            'inter_op_threads': results[0]['inter_op_threads'],
+            'epoch_seconds': float(np.mean([r['epoch_seconds'] for r in results])),
+            'predict_ms': float(np.mean([r['predict_ms'] for r in results])),
+            'total_samples_per_sec': float(sum(r['samples_per_sec'] for r in results))
+        }
+        print(f"⏱️ {name}: epoch {row['epoch_seconds']:.2f}s | predict {row['predict_ms']:.1f}ms | "
+              f"{row['total_samples_per_sec']:.0f} mẫu/s ({n_workers} worker)")
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('profile')
+
+def recommend_profile(results, workload='training'):
+    """
+    Chọn profile tốt nhất từ kết quả benchmark_profiles theo loại tải:
+    - 'inference': predict_ms nhỏ nhất
+    - 'training': epoch_seconds nhỏ nhất (một tiến trình huấn luyện)
+    - 'multi': total_samples_per_sec lớn nhất (nhiều worker cùng lúc)
+    """
+    if workload == 'inference':
+        return results['predict_ms'].idxmin()
+    if workload == 'training':
+        return results['epoch_seconds'].idxmin()
+    if workload == 'multi':
+        return results['total_samples_per_sec'].idxmax()
+    raise ValueError("workload phải là 'inference', 'training' hoặc 'multi'.")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Script chạy baseline ARIMA hàng loạt (ví dụ chạy hằng đêm)
+Mỗi file CSV trong DATA_DIR là một mã; nếu chỉ có một file thì chạy cho các cột High/Low/Close
+"""
+
+import os
+import sys
+import glob
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils import load_data
+from arima_batch import run_arima_batch, series_from_columns, series_from_files
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+OUTPUT_PATH = os.path.join(ROOT_DIR, 'models', 'arima_batch_results.csv')
+SEARCH = 'stepwise'  # 'stepwise' hoặc 'grid'
+TRAIN_RATIO = 0.8
+N_FORECAST = 5
+
+def main():
+    file_paths = sorted(glob.glob(os.path.join(DATA_DIR, '*.csv')))
+    if len(file_paths) == 1:
+        series = series_from_columns(load_data(file_paths[0]))
+    else:
+        series = series_from_files(file_paths)
+
+    print(f"🚀 Chạy ARIMA ({SEARCH}) cho {len(series)} chuỗi...")
+    results = run_arima_batch(
+        series,
+        train_ratio=TRAIN_RATIO,
+        search=SEARCH,
+        n_forecast=N_FORECAST,
+        output_path=OUTPUT_PATH
+    )
+
+    print("\n📊 Kết quả:")
+    print(results.drop(columns=['error']).round(4).to_string())
+    print(f"\n💾 Đã lưu kết quả vào {OUTPUT_PATH}")
+    return results
+
+if __name__ == "__main__":
+    main()
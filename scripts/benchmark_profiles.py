@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Script đo hiệu năng các profile thực thi CPU (latency / throughput / shared) trên máy hiện tại
+In thời gian một epoch train_model, độ trễ predict_future và đề xuất profile phù hợp
+"""
+
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from runtime_config import available_cpus, benchmark_profiles, recommend_profile
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+PROFILES = ('latency', 'throughput', 'shared')
+SHARED_WORKERS = 2  # Số worker chạy đồng thời khi đo profile 'shared'
+EPOCHS = 3
+N_FUTURE = 20
+REPEATS = 10
+WORKLOAD = 'training'  # 'inference', 'training' hoặc 'multi'
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'VNI_2020_2025_FINAL.csv')
+
+def main():
+    print(f"🚀 Benchmark profile thực thi trên {len(available_cpus())} CPU...")
+    results = benchmark_profiles(
+        DATA_PATH,
+        profiles=PROFILES,
+        shared_workers=SHARED_WORKERS,
+        epochs=EPOCHS,
+        n_future=N_FUTURE,
+        repeats=REPEATS
+    )
+    print(f"\n{results.round(3).to_string()}")
+
+    for workload in ('inference', 'training', 'multi'):
+        marker = ' 👈' if workload == WORKLOAD else ''
+        print(f"💡 {workload}: {recommend_profile(results, workload)}{marker}")
+    best = recommend_profile(results, WORKLOAD)
+    print(f"\n✅ Đề xuất: đặt TF_EXECUTION_PROFILE={best} khi chạy app.py / scripts")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Script kiểm tra hồi quy cho các đường tính nhanh so với cách tính gốc (chậm):
+- create_dataset / WindowBatchGenerator / make_streaming_dataset (view cửa sổ) so với vòng lặp cắt cửa sổ cũ
+- IndicatorEngine (cập nhật tăng dần) so với add_technical_indicators (tính lại toàn bộ)
+- rolling_one_step_forecast (extend Kalman filter) so với filter lại từng ngày với cùng tham số
+"""
+
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from data_utils import load_data, add_technical_indicators, IndicatorEngine, INDICATOR_COLUMNS
+from model_utils import create_dataset, make_window_generators, make_streaming_dataset
+from arima_model import rolling_one_step_forecast
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+DATA_FILE = "data/VNI_2020_2025_FINAL.csv"
+TIME_STEP = 20
+TARGET_COL_INDEX = 3
+N_FUTURE_VALUES = [1, 5]
+BATCH_SIZE = 32
+INDICATOR_WARMUP = 200          # Số phiên đầu tiên đưa vào IndicatorEngine trong một lần
+INDICATOR_CHUNK = 7             # Các phiên còn lại được cập nhật theo từng nhóm nhỏ
+ARIMA_ORDER = (2, 1, 1)
+ARIMA_TEST_DAYS = 30
+
+def _old_windows(dataset, time_step, target_col_index, n_future):
+    # Cách cắt cửa sổ trước khi dùng view: copy từng cửa sổ trong vòng lặp
+    X, Y = [], []
+    for i in range(len(dataset) - time_step - n_future + 1):
+        X.append(dataset[i:i + time_step, :])
+        if n_future == 1:
+            Y.append(dataset[i + time_step, target_col_index])
+        else:
+            Y.append(dataset[i + time_step:i + time_step + n_future, target_col_index])
+    return np.array(X), np.array(Y)
+
+def check_windowing(data):
+    values = data.to_numpy(dtype=np.float32)
+    for n_future in N_FUTURE_VALUES:
+        X, Y = create_dataset(values, TIME_STEP, TARGET_COL_INDEX, n_future=n_future)
+        X_old, Y_old = _old_windows(values, TIME_STEP, TARGET_COL_INDEX, n_future)
+        if not (np.array_equal(X, X_old) and np.array_equal(Y, Y_old)):
+            raise AssertionError(f"❌ create_dataset (n_future={n_future}) khác vòng lặp cắt cửa sổ cũ")
+
+        train_gen, val_gen = make_window_generators(X, Y, BATCH_SIZE, validation_split=0.2, shuffle=False)
+        batches = [train_gen[i] for i in range(len(train_gen))] + [val_gen[i] for i in range(len(val_gen))]
+        X_batches = np.concatenate([x for x, _ in batches])
+        Y_batches = np.concatenate([y for _, y in batches])
+        if not (np.array_equal(X_batches, X_old) and np.array_equal(Y_batches, Y_old)):
+            raise AssertionError(f"❌ WindowBatchGenerator (n_future={n_future}) khác vòng lặp cắt cửa sổ cũ")
+
+    # make_streaming_dataset chỉ hỗ trợ dự đoán một bước
+    X_old, Y_old = _old_windows(values, TIME_STEP, TARGET_COL_INDEX, 1)
+    dataset = make_streaming_dataset(values, TIME_STEP, TARGET_COL_INDEX, BATCH_SIZE)
+    X_stream = np.concatenate([x.numpy() for x, _ in dataset])
+    Y_stream = np.concatenate([y.numpy() for _, y in dataset])
+    if not (np.array_equal(X_stream, X_old) and np.array_equal(Y_stream, Y_old)):
+        raise AssertionError("❌ make_streaming_dataset khác vòng lặp cắt cửa sổ cũ")
+    print(f"✅ Cửa sổ trượt khớp vòng lặp cũ ({len(X_old)} cửa sổ, n_future={N_FUTURE_VALUES})")
+
+def check_indicator_engine(data):
+    expected = add_technical_indicators(data)
+    engine = IndicatorEngine()
+    parts = [engine.update(data.iloc[:INDICATOR_WARMUP])]
+    for start in range(INDICATOR_WARMUP, len(data), INDICATOR_CHUNK):
+        parts.append(engine.update(data.iloc[start:start + INDICATOR_CHUNK]))
+    result = pd.concat(parts)
+
+    for col in INDICATOR_COLUMNS:
+        if not np.array_equal(result[col].to_numpy(), expected[col].to_numpy(), equal_nan=True):
+            diff = np.nanmax(np.abs(result[col].to_numpy() - expected[col].to_numpy()))
+            raise AssertionError(f"❌ IndicatorEngine lệch add_technical_indicators ở cột {col} (max |diff| = {diff})")
+    print(f"✅ IndicatorEngine khớp add_technical_indicators trên {len(data)} phiên ({len(parts)} lần cập nhật)")
+
+def check_arima_rolling(data):
+    series = data['Close'].astype(float)
+    train, test = series.iloc[:-ARIMA_TEST_DAYS], series.iloc[-ARIMA_TEST_DAYS:]
+    train_values = train.to_numpy()
+    fitted = ARIMA(train_values, order=ARIMA_ORDER).fit()
+
+    # Cách gốc: mỗi ngày filter lại toàn bộ lịch sử tới hôm trước với cùng tham số rồi dự đoán 1 bước
+    expected = []
+    for i in range(len(test)):
+        history = np.concatenate([train_values, test.to_numpy()[:i]])
+        expected.append(ARIMA(history, order=ARIMA_ORDER).filter(fitted.params).forecast(1)[0])
+    expected = np.array(expected)
+
+    # Mảng numpy đi qua extend, Series có DatetimeIndex không freq đi qua nhánh filter lại
+    fitted_dated = ARIMA(train, order=ARIMA_ORDER).filter(fitted.params)
+    for name, model, test_data in [("extend", fitted, test.to_numpy()), ("filter lại", fitted_dated, test)]:
+        predictions = rolling_one_step_forecast(model, test_data)
+        if not np.allclose(predictions, expected, rtol=1e-9, atol=1e-6):
+            diff = np.max(np.abs(predictions - expected))
+            raise AssertionError(f"❌ rolling_one_step_forecast ({name}) lệch dự đoán từng ngày (max |diff| = {diff})")
+    print(f"✅ rolling_one_step_forecast khớp filter lại từng ngày ({ARIMA_TEST_DAYS} ngày, ARIMA{ARIMA_ORDER})")
+
+def main():
+    data = load_data(DATA_FILE)
+    check_windowing(data)
+    check_indicator_engine(data)
+    check_arima_rolling(data)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Script kiểm tra cache rollout của predict_future không giữ model sống
+Tạo vài mô hình, chạy dự đoán (rollout, step, batch rollout), xóa mô hình rồi kiểm tra cache đã rỗng
+"""
+
+import os
+import sys
+import gc
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+import predict_future
+from model_utils import build_model
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+N_MODELS = 3
+TIME_STEP = 10
+NUM_FEATURES = 3
+N_FUTURE = 5
+
+def main():
+    data = np.random.default_rng(42).random((100, NUM_FEATURES), dtype=np.float32)
+    scaler = MinMaxScaler().fit(data)
+    for _ in range(N_MODELS):
+        model = build_model('LSTM', TIME_STEP, NUM_FEATURES, 8, 0.1, 1)
+        predict_future.predict_future(model, data, TIME_STEP, N_FUTURE, scaler, NUM_FEATURES, 0)
+        predict_future.get_step_fn(model, TIME_STEP, NUM_FEATURES, 0)(data[:TIME_STEP], data[TIME_STEP - 1])
+        predict_future.get_batch_rollout_fn(model, TIME_STEP, NUM_FEATURES, 0)(
+            np.stack([data[:TIME_STEP], data[1:TIME_STEP + 1]]), N_FUTURE
+        )
+        del model
+    gc.collect()
+
+    remaining = len(predict_future._ROLLOUT_CACHE)
+    if remaining:
+        raise AssertionError(f"❌ Cache rollout còn giữ {remaining}/{N_MODELS} mô hình đã xóa")
+    print(f"✅ Cả {N_MODELS} mô hình đã được giải phóng khỏi cache rollout")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Script tìm siêu tham số cho LSTM/GRU (có thể chạy qua đêm)
+Kết quả lưu trong models/hparam_search.db, chạy lại cùng STUDY_NAME sẽ tiếp tục từ các trial đã có
+"""
+
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils import load_data, add_technical_indicators
+from hparam_search import run_hparam_search
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+STUDY_NAME = 'vni_close'
+N_TRIALS = 100
+SAMPLER = 'tpe'  # 'tpe' hoặc 'random'
+MAX_WORKERS = None  # None = số core
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'VNI_2020_2025_FINAL.csv')
+
+def main():
+    DATA_CONFIG = {
+        'features_to_use': ['Close', 'Volume', 'RSI', 'MACD'],
+        'target_column': 'Close'
+    }
+    BASE_CONFIG = {
+        'epochs': 50,
+        'validation_split': 0.1,
+        'loss_fn': 'mae',
+        'scaler_type': 'minmax',
+        'train_ratio': 0.8,
+        'patience': 10
+    }
+
+    data = add_technical_indicators(load_data(DATA_PATH))
+    trials, best_params = run_hparam_search(
+        data,
+        DATA_CONFIG['features_to_use'],
+        DATA_CONFIG['target_column'],
+        n_trials=N_TRIALS,
+        sampler=SAMPLER,
+        study_name=STUDY_NAME,
+        base_config=BASE_CONFIG,
+        max_workers=MAX_WORKERS
+    )
+
+    print("\n📊 10 trial tốt nhất:")
+    print(trials.sort_values('value').head(10).round(6).to_string())
+    if best_params is not None:
+        print("\n🏆 Cấu hình tốt nhất (dùng cho MODEL_CONFIG / TRAIN_CONFIG):")
+        for name, value in best_params.items():
+            print(f"  {name}: {value}")
+    return trials, best_params
+
+if __name__ == "__main__":
+    main()
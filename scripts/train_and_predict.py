@@ -10,7 +10,6 @@ import pickle
 import os
 import json
 from datetime import datetime, timedelta
-from tensorflow.keras.callbacks import EarlyStopping
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,8 +18,17 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Profile thực thi ('latency', 'throughput', 'shared'), phải áp dụng trước khi import TensorFlow
+from runtime_config import apply_profile
+EXECUTION_PROFILE = os.environ.get('TF_EXECUTION_PROFILE', 'throughput')
+apply_profile(EXECUTION_PROFILE)
+
+from tensorflow.keras.callbacks import EarlyStopping
 from data_utils import load_data, add_technical_indicators
-from model_utils import preprocess_data, build_model, train_model, evaluate_model
+from model_utils import (
+    preprocess_data, build_model, train_model, train_model_streaming, evaluate_model, training_cutoff,
+    TrainingTelemetry, telemetry_metadata, telemetry_log_path
+)
 
 # ===== CONSTANTS - Dễ dàng thay đổi =====
 MODEL_TYPE = 'LSTM'  # Thay đổi thành 'GRU' nếu muốn sử dụng GRU
@@ -36,7 +44,8 @@ def main():
         'num_hidden_layers': 2,
         'learning_rate': 0.001,
         'loss_fn': 'mae',
-        'use_batch_norm': False
+        'use_batch_norm': False,
+        'precision': None  # 'mixed_bfloat16' trên CPU hỗ trợ AVX512-BF16/AMX
     }
     
     # ===== THÔNG SỐ HUẤN LUYỆN =====
@@ -44,7 +53,9 @@ def main():
         'epochs': 50,
         'batch_size': 32,
         'validation_split': 0.1,
-        'time_step': 50
+        'time_step': 50,
+        'streaming': False,  # True: cắt cửa sổ on-the-fly bằng tf.data thay vì X_train/y_train
+        'cache_dataset': False
     }
     
     # ===== THÔNG SỐ DỮ LIỆU =====
@@ -106,7 +117,8 @@ def main():
         num_hidden_layers=MODEL_CONFIG['num_hidden_layers'],
         loss_fn=MODEL_CONFIG['loss_fn'],
         learning_rate=MODEL_CONFIG['learning_rate'],
-        use_batch_norm=MODEL_CONFIG['use_batch_norm']
+        use_batch_norm=MODEL_CONFIG['use_batch_norm'],
+        precision=MODEL_CONFIG['precision']
     )
     
     print("✅ Mô hình đã được xây dựng thành công!")
@@ -116,28 +128,41 @@ def main():
     print("\n🎯 Bắt đầu huấn luyện mô hình...")
     
     # Callbacks
+    telemetry = TrainingTelemetry(metadata=telemetry_metadata({**MODEL_CONFIG, **TRAIN_CONFIG}, source='script'))
     callbacks = [
         EarlyStopping(
             monitor='val_loss',
             patience=10,
             restore_best_weights=True,
             verbose=1
-        )
+        ),
+        telemetry
     ]
     
-    history = train_model(
-        model=model,
-        X_train=X_train,
-        y_train=y_train,
-        config=TRAIN_CONFIG,
-        callbacks=callbacks
-    )
+    target_col_index = DATA_CONFIG['features_to_use'].index(DATA_CONFIG['target_column'])
+    if TRAIN_CONFIG['streaming']:
+        # Phần train của scaled_data gồm len(X_train) cửa sổ + time_step dòng đầu
+        train_data_scaled = scaled_data[:len(X_train) + TRAIN_CONFIG['time_step']]
+        history = train_model_streaming(
+            model=model,
+            data=train_data_scaled,
+            target_col_index=target_col_index,
+            config=TRAIN_CONFIG,
+            callbacks=callbacks
+        )
+    else:
+        history = train_model(
+            model=model,
+            X_train=X_train,
+            y_train=y_train,
+            config=TRAIN_CONFIG,
+            callbacks=callbacks
+        )
     
     print("✅ Huấn luyện hoàn thành!")
     
     # ===== ĐÁNH GIÁ MÔ HÌNH =====
     print("\n📊 Đang đánh giá mô hình...")
-    target_col_index = DATA_CONFIG['features_to_use'].index(DATA_CONFIG['target_column'])
     
     metrics, y_test_inv, y_pred_inv = evaluate_model(
         model=model,
@@ -151,6 +176,22 @@ def main():
     for metric, value in metrics.items():
         print(f"   {metric}: {value:.4f}")
     
+    # Backtest dự đoán đệ quy PREDICTION_DAYS ngày từ mọi điểm gốc trong tập test
+    from predict_future import backtest_forecasts
+    train_size = int(len(data_clean) * DATA_CONFIG['train_ratio'])
+    backtest_metrics, _, _ = backtest_forecasts(
+        model=model,
+        data=scaled_data,
+        time_step=TRAIN_CONFIG['time_step'],
+        n_future=PREDICTION_DAYS,
+        scaler=scaler,
+        num_features=len(DATA_CONFIG['features_to_use']),
+        target_col_index=target_col_index,
+        start=train_size
+    )
+    print(f"📉 Backtest rolling-origin trên tập test (theo horizon):")
+    print(backtest_metrics[['MAE', 'RMSE']].round(4))
+    
     # ===== LƯU MÔ HÌNH =====
     print("\n💾 Đang lưu mô hình...")
     
@@ -165,6 +206,10 @@ def main():
     model.save(model_path)
     print(f"✅ Đã lưu mô hình: {model_path}")
     
+    # Lưu log telemetry huấn luyện (JSONL) cạnh mô hình
+    telemetry.save(telemetry_log_path(model_path))
+    print(f"✅ Đã lưu telemetry: {telemetry_log_path(model_path)}")
+    
     # Lưu scaler
     scaler_path = f'../models/model_{model_type_name}_{timestamp}_scaler.pkl'
     with open(scaler_path, 'wb') as f:
@@ -179,7 +224,8 @@ def main():
         'data_config': DATA_CONFIG,
         'metrics': metrics,
         'features_to_use': DATA_CONFIG['features_to_use'],
-        'target_column': DATA_CONFIG['target_column']
+        'target_column': DATA_CONFIG['target_column'],
+        'trained_until': training_cutoff(data_clean, DATA_CONFIG['train_ratio'])
     }
     with open(config_path, 'wb') as f:
         pickle.dump(config, f)
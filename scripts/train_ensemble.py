@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Script huấn luyện ensemble nhiều seed cho LSTM/GRU
+Các thành viên huấn luyện song song trên nhiều process, sau đó được ghép thành một mô hình duy nhất
+lưu vào models/ (tải được từ tab Quản lý mô hình) và dự đoán kèm độ lệch chuẩn giữa các seed
+"""
+
+import os
+import sys
+from datetime import datetime
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils import load_data, add_technical_indicators
+from ensemble import train_ensemble
+from incremental_update import save_model_version
+from model_utils import training_cutoff
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+MODEL_TYPE = 'LSTM'
+N_MEMBERS = 5
+BASE_SEED = 42
+MAX_WORKERS = None  # None = min(N_MEMBERS, số core)
+PREDICTION_DAYS = 20
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'VNI_2020_2025_FINAL.csv')
+
+def main():
+    MODEL_CONFIG = {
+        'model_type': MODEL_TYPE,
+        'num_neurons': 64,
+        'dropout_rate': 0.35,
+        'num_hidden_layers': 2,
+        'learning_rate': 0.001,
+        'loss_fn': 'mae',
+        'use_batch_norm': False
+    }
+    TRAIN_CONFIG = {
+        'epochs': 50,
+        'batch_size': 32,
+        'validation_split': 0.1,
+        'time_step': 50,
+        'train_ratio': 0.8
+    }
+    DATA_CONFIG = {
+        'features_to_use': ['Close', 'Volume', 'RSI', 'MACD'],
+        'target_column': 'Close'
+    }
+
+    print(f"🚀 Huấn luyện ensemble {N_MEMBERS} mô hình {MODEL_TYPE} (seed {BASE_SEED}..{BASE_SEED + N_MEMBERS - 1})...")
+    data = add_technical_indicators(load_data(DATA_PATH)).dropna()
+    ensemble, report, scaler, scaled_data = train_ensemble(
+        data,
+        DATA_CONFIG['features_to_use'],
+        DATA_CONFIG['target_column'],
+        MODEL_CONFIG,
+        TRAIN_CONFIG,
+        n_members=N_MEMBERS,
+        base_seed=BASE_SEED,
+        max_workers=MAX_WORKERS
+    )
+    print(f"\n📊 Kết quả theo seed:\n{report[['MAE', 'RMSE', 'R²']].round(4)}")
+
+    config = {
+        **MODEL_CONFIG,
+        **TRAIN_CONFIG,
+        **DATA_CONFIG,
+        'metrics': report.loc['ensemble', ['MAE', 'MSE', 'RMSE', 'R²']].to_dict(),
+        'ensemble_size': N_MEMBERS,
+        'seeds': list(range(BASE_SEED, BASE_SEED + N_MEMBERS)),
+        'trained_until': training_cutoff(data, TRAIN_CONFIG.get('train_ratio', 0.8))
+    }
+    name = save_model_version(
+        ensemble, scaler, config,
+        name=f"model_ensemble_{MODEL_TYPE.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    )
+    print(f"💾 Đã lưu ensemble: models/{name}.h5")
+
+    from predict_future import predict_future
+    mean, spread = predict_future(
+        ensemble,
+        scaled_data,
+        TRAIN_CONFIG['time_step'],
+        PREDICTION_DAYS,
+        scaler,
+        len(DATA_CONFIG['features_to_use']),
+        DATA_CONFIG['features_to_use'].index(DATA_CONFIG['target_column']),
+        return_spread=True
+    )
+    return name, mean, spread
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Script cập nhật mô hình hằng ngày (chạy sau vnindex_crawler_and_merge.py)
+Fine-tune mô hình mới nhất trong models/ trên các phiên vừa được thêm, lưu thành phiên bản mới
+"""
+
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils import load_data, add_technical_indicators
+from incremental_update import update_model_incremental
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+MODEL_TYPE = None  # None = mô hình mới nhất bất kể loại, hoặc 'LSTM' / 'GRU'
+EPOCHS = 5
+LR_FACTOR = 0.1
+REPLAY_SIZE = 256
+NEW_SINCE = None  # Ngày dòng train cuối (vd '2024-08-30'), chỉ cần với mô hình cũ chưa lưu 'trained_until'
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'VNI_2020_2025_FINAL.csv')
+
+def main():
+    print("🚀 Cập nhật mô hình với dữ liệu mới...")
+    data = add_technical_indicators(load_data(DATA_PATH))
+    new_name, history = update_model_incremental(
+        data,
+        model_type=MODEL_TYPE,
+        epochs=EPOCHS,
+        lr_factor=LR_FACTOR,
+        replay_size=REPLAY_SIZE,
+        new_since=NEW_SINCE
+    )
+    if history is not None:
+        print(f"📉 Loss theo epoch: {[round(loss, 6) for loss in history.history['loss']]}")
+    return new_name
+
+if __name__ == "__main__":
+    main()
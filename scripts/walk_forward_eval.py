@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Script đánh giá walk-forward mô hình LSTM/GRU
+Mỗi fold huấn luyện lại từ đầu, các fold chạy song song trên nhiều process
+"""
+
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_utils import load_data, add_technical_indicators
+from walk_forward import run_walk_forward
+
+# ===== CONSTANTS - Dễ dàng thay đổi =====
+MODEL_TYPE = 'LSTM'
+N_FOLDS = 10
+MODE = 'expanding'  # 'expanding' hoặc 'sliding'
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'VNI_2020_2025_FINAL.csv')
+
+def main():
+    MODEL_CONFIG = {
+        'model_type': MODEL_TYPE,
+        'num_neurons': 64,
+        'dropout_rate': 0.35,
+        'num_hidden_layers': 2,
+        'learning_rate': 0.001,
+        'loss_fn': 'mae',
+        'use_batch_norm': False
+    }
+    TRAIN_CONFIG = {
+        'epochs': 50,
+        'batch_size': 32,
+        'validation_split': 0.1,
+        'time_step': 50
+    }
+    DATA_CONFIG = {
+        'features_to_use': ['Close', 'Volume', 'RSI', 'MACD'],
+        'target_column': 'Close',
+        'scaler_type': 'minmax'
+    }
+
+    print(f"🚀 Walk-forward {MODE} {N_FOLDS} folds cho mô hình {MODEL_TYPE}...")
+    data = add_technical_indicators(load_data(DATA_PATH))
+
+    report, summary = run_walk_forward(
+        data,
+        DATA_CONFIG['features_to_use'],
+        DATA_CONFIG['target_column'],
+        MODEL_CONFIG,
+        TRAIN_CONFIG,
+        n_folds=N_FOLDS,
+        mode=MODE,
+        scaler_type=DATA_CONFIG['scaler_type']
+    )
+
+    print("\n📊 Kết quả từng fold:")
+    print(report.round(4).to_string())
+    print("\n📈 Tổng hợp:")
+    print(summary.round(4).to_string())
+    return report, summary
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Hàng đợi huấn luyện chạy nền cho dashboard.
+- Job được ghi vào SQLite (models/training_jobs.db) kèm cấu hình và dữ liệu đã pickle
+  (models/jobs/job_<id>_data.pkl); mô hình lưu thành models/<tên>_job<id>.*
+- Worker là process riêng (python training_jobs.py), lần lượt nhận job 'queued', huấn luyện,
+  ghi tiến độ từng epoch vào CSDL và lưu model/scaler/config vào models/ khi xong
+- UI chỉ đọc CSDL (polling) nên không bị khóa; hủy job bằng cờ cancel_requested mà worker kiểm tra mỗi epoch
+- Worker tự thoát sau idle_timeout giây không có job; ensure_worker() khởi động lại khi cần
+"""
+import os
+import sys
+import re
+import json
+import time
+import pickle
+import sqlite3
+import threading
+import contextlib
+import subprocess
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(ROOT_DIR, 'models')
+DEFAULT_DB_PATH = os.path.join(MODELS_DIR, 'training_jobs.db')
+JOBS_DATA_DIR = os.path.join(MODELS_DIR, 'jobs')
+
+ACTIVE_STATES = ('queued', 'running')
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 30
+
+# Các CSDL đã tạo bảng trong process này: dashboard tạo JobStore mỗi lần polling nên chỉ chạy DDL một lần
+_INITIALIZED_DBS = set()
+_INIT_LOCK = threading.Lock()
+
+def slugify_job_name(name):
+    """
+    Chuẩn hóa tên job do người dùng nhập: chỉ giữ chữ (kể cả tiếng Việt), số, '-', '_'; ký tự khác,
+    kể cả '/' và '.', đổi thành '_' để tên không thể trỏ ra ngoài models/. Trả về None nếu không còn ký tự hợp lệ.
+    """
+    slug = re.sub(r'[^\w-]+', '_', str(name or '')).strip('_-')
+    return slug[:100] or None
+
+def job_model_name(job):
+    """
+    Tên file mô hình của job (<name>_job<id>): có id nên hai job trùng tên không ghi đè lên nhau.
+    """
+    return f"{job['name']}_job{job['id']}"
+
+class JobStore:
+    """
+    Kho trạng thái job dùng chung giữa dashboard (có thể nhiều session) và worker.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        with _INIT_LOCK:
+            db_key = os.path.abspath(db_path)
+            if db_key not in _INITIALIZED_DBS or not os.path.exists(db_key):
+                self._init_db()
+                _INITIALIZED_DBS.add(db_key)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    data_path TEXT NOT NULL,
+                    created REAL,
+                    started REAL,
+                    finished REAL,
+                    epoch INTEGER DEFAULT 0,
+                    total_epochs INTEGER,
+                    loss REAL,
+                    val_loss REAL,
+                    history TEXT,
+                    metrics TEXT,
+                    model_name TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER DEFAULT 0,
+                    worker_pid INTEGER
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    pid INTEGER PRIMARY KEY,
+                    heartbeat REAL
+                )
+            """)
+
+    def _open(self):
+        return sqlite3.connect(self.db_path, timeout=60)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # `with sqlite3.Connection` chỉ commit/rollback, không đóng kết nối
+        conn = self._open()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, data, config, name=None):
+        """
+        Đưa một job vào hàng đợi. data là DataFrame đầu vào (sẽ được dropna khi huấn luyện).
+        name chỉ là tên hiển thị (đã qua slugify_job_name); file dữ liệu và mô hình đặt theo id của job.
+        """
+        name = slugify_job_name(name) or f"model_{config['model_type'].lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        os.makedirs(JOBS_DATA_DIR, exist_ok=True)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (name, status, config, data_path, created, total_epochs) VALUES (?, 'queued', ?, '', ?, ?)",
+                (name, json.dumps(config), time.time(), int(config['epochs']))
+            )
+            job_id = cursor.lastrowid
+            # Ghi dữ liệu trong cùng transaction: worker chưa thấy job cho tới khi commit, lỗi thì rollback
+            data_path = os.path.join(JOBS_DATA_DIR, f"job_{job_id}_data.pkl")
+            with open(data_path, 'wb') as f:
+                pickle.dump(data, f)
+            conn.execute("UPDATE jobs SET data_path = ? WHERE id = ?", (data_path, job_id))
+            return job_id
+
+    def get(self, job_id):
+        jobs = self.list_jobs(job_id=job_id)
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, limit=50, job_id=None):
+        query = "SELECT * FROM jobs"
+        args = []
+        if job_id is not None:
+            query += " WHERE id = ?"
+            args.append(job_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(query, args).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            for key in ('config', 'history', 'metrics'):
+                job[key] = json.loads(job[key]) if job[key] else None
+            jobs.append(job)
+        return jobs
+
+    def request_cancel(self, job_id):
+        """
+        Job đang chờ bị hủy ngay; job đang chạy dừng sau epoch hiện tại.
+        """
+        with self._connect() as conn:
+            cancelled_queued = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            ).rowcount
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            data_path = conn.execute("SELECT data_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        # Job chưa chạy thì không còn ai dùng file dữ liệu
+        if cancelled_queued and data_path and os.path.exists(data_path[0]):
+            os.remove(data_path[0])
+
+    def is_cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def claim_next(self, worker_pid):
+        """
+        Nhận job 'queued' cũ nhất một cách nguyên tử (nhiều worker không nhận trùng job).
+        """
+        conn = self._open()
+        try:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', started = ?, worker_pid = ? WHERE id = ?",
+                    (time.time(), worker_pid, row[0])
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.get(row[0]) if row is not None else None
+
+    def update_progress(self, job_id, epoch, loss, val_loss, history):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET epoch = ?, loss = ?, val_loss = ?, history = ? WHERE id = ?",
+                (epoch, loss, val_loss, json.dumps(history), job_id)
+            )
+
+    def finish(self, job_id, status, metrics=None, model_name=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, metrics = ?, model_name = ?, error = ? WHERE id = ?",
+                (status, time.time(), json.dumps(metrics) if metrics is not None else None, model_name, error, job_id)
+            )
+
+    def heartbeat(self, worker_pid):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (pid, heartbeat) VALUES (?, ?)", (worker_pid, time.time()))
+
+    def remove_worker(self, worker_pid):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE pid = ?", (worker_pid,))
+
+    def live_workers(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT pid FROM workers WHERE heartbeat >= ?", (time.time() - HEARTBEAT_TIMEOUT,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def fail_orphaned_jobs(self):
+        """
+        Job 'running' mà worker đã chết (không còn heartbeat) được đánh dấu 'failed'.
+        """
+        live = set(self.live_workers())
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+            for job_id, worker_pid in rows:
+                if worker_pid not in live:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                        (time.time(), "Worker đã dừng giữa chừng", job_id)
+                    )
+
+def ensure_worker(db_path=DEFAULT_DB_PATH, max_workers=1):
+    """
+    Khởi động worker nền nếu số worker còn sống ít hơn max_workers. Worker chạy trong
+    session riêng nên không bị dừng khi Streamlit rerun script.
+    """
+    store = JobStore(db_path)
+    store.fail_orphaned_jobs()
+    for _ in range(max_workers - len(store.live_workers())):
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), db_path],
+            cwd=ROOT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        # Đăng ký ngay để lần gọi tiếp theo không khởi động thêm worker trước khi process kịp chạy
+        store.heartbeat(process.pid)
+
+def submit_training_job(data, config, name=None, db_path=DEFAULT_DB_PATH, max_workers=1):
+    """
+    Đưa job vào hàng đợi và đảm bảo có worker xử lý. Trả về id của job.
+    """
+    job_id = JobStore(db_path).submit(data, config, name)
+    ensure_worker(db_path, max_workers)
+    return job_id
+
+def _run_job(store, job):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from model_utils import (
+        preprocess_data, build_model, train_model, evaluate_model, TrainingTelemetry, telemetry_log_path,
+        telemetry_metadata, training_cutoff
+    )
+
+    config = job['config']
+    with open(job['data_path'], 'rb') as f:
+        data = pickle.load(f)
+
+    X_train, y_train, X_test, y_test, scaler, _ = preprocess_data(
+        data.dropna(),
+        config['features_to_use'],
+        config['target_column'],
+        config['time_step'],
+        n_future=config.get('n_future', 1)
+    )
+    model = build_model(
+        config['model_type'],
+        config['time_step'],
+        len(config['features_to_use']),
+        config['num_neurons'],
+        config['dropout_rate'],
+        config['num_hidden_layers'],
+        learning_rate=config.get('learning_rate', 0.001),
+        n_future=config.get('n_future', 1),
+        precision=config.get('precision')
+    )
+
+    class JobProgressCallback(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.history = {'loss': [], 'val_loss': []}
+            self.cancelled = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            self.history['loss'].append(float(logs.get('loss', float('nan'))))
+            self.history['val_loss'].append(float(logs.get('val_loss', float('nan'))))
+            store.update_progress(job['id'], epoch + 1, logs.get('loss'), logs.get('val_loss'), self.history)
+            if store.is_cancel_requested(job['id']):
+                self.cancelled = True
+                self.model.stop_training = True
+
+    progress = JobProgressCallback()
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, min_delta=0.001, restore_best_weights=True)
+    # Telemetry ghi trực tiếp vào file cạnh mô hình nên xem được ngay khi job đang chạy
+    model_name = job_model_name(job)
+    telemetry_path = telemetry_log_path(os.path.join(MODELS_DIR, model_name))
+    telemetry = TrainingTelemetry(
+        log_path=telemetry_path, run_id=f"job-{job['id']}", metadata=telemetry_metadata(config, source='job')
+    )
+    train_model(model, X_train, y_train, config, callbacks=[early_stopping, progress, telemetry])
+    if progress.cancelled:
+        if os.path.exists(telemetry_path):
+            os.remove(telemetry_path)
+        store.finish(job['id'], 'cancelled')
+        return
+
+    metrics, _, _ = evaluate_model(
+        model, X_test, y_test, scaler, config['features_to_use'].index(config['target_column'])
+    )
+
+    # Lưu giống tab Quản lý mô hình: <name>.h5, <name>_scaler.pkl, <name>_config.pkl
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    model.save(os.path.join(MODELS_DIR, f"{model_name}.h5"))
+    with open(os.path.join(MODELS_DIR, f"{model_name}_scaler.pkl"), 'wb') as f:
+        pickle.dump(scaler, f)
+    with open(os.path.join(MODELS_DIR, f"{model_name}_config.pkl"), 'wb') as f:
+        pickle.dump({**config, 'trained_until': training_cutoff(data.dropna())}, f)
+    store.finish(job['id'], 'done', metrics={k: float(v) for k, v in metrics.items()}, model_name=model_name)
+
+def run_worker(db_path=DEFAULT_DB_PATH, idle_timeout=300, poll_interval=1.0):
+    """
+    Vòng lặp worker: nhận và chạy lần lượt các job, thoát khi không có job trong idle_timeout giây.
+    """
+    store = JobStore(db_path)
+    pid = os.getpid()
+    store.heartbeat(pid)
+    stop_event = threading.Event()
+
+    def beat():
+        # Heartbeat từ thread riêng để epoch dài không làm worker bị coi là đã chết
+        while not stop_event.wait(HEARTBEAT_INTERVAL):
+            store.heartbeat(pid)
+
+    threading.Thread(target=beat, daemon=True).start()
+    last_active = time.time()
+    try:
+        while time.time() - last_active < idle_timeout:
+            job = store.claim_next(pid)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            print(f"🚀 Job {job['id']} ({job['name']}) bắt đầu")
+            try:
+                _run_job(store, job)
+            except Exception as e:
+                store.finish(job['id'], 'failed', error=str(e))
+                print(f"❌ Job {job['id']} lỗi: {e}")
+            finally:
+                if os.path.exists(job['data_path']):
+                    os.remove(job['data_path'])
+            last_active = time.time()
+    finally:
+        stop_event.set()
+        store.remove_worker(pid)
+
+if __name__ == "__main__":
+    # Worker chạy cạnh dashboard trên cùng máy nên chỉ dùng một nửa số core
+    from runtime_config import apply_profile
+    apply_profile('shared', n_workers=2, worker_index=1)
+    run_worker(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
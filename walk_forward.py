@@ -0,0 +1,131 @@
+"""
+Đánh giá walk-forward: chia chuỗi thời gian thành nhiều fold (expanding hoặc sliding),
+mỗi fold fit lại scaler, huấn luyện lại mô hình và đánh giá trên đoạn kế tiếp.
+Các fold chạy song song trên process pool, mỗi worker được giới hạn số thread TensorFlow
+để tổng số thread không vượt quá số core của máy.
+"""
+import os
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from runtime_config import init_pool_worker
+
+def make_walk_forward_folds(n_samples, n_folds=10, test_size=None, mode='expanding', min_train_size=None):
+    """
+    Tạo danh sách fold (train_start, train_end, test_end) theo chỉ số dòng.
+    - expanding: train luôn bắt đầu từ 0 và dài dần theo từng fold
+    - sliding: train có độ dài cố định min_train_size, trượt theo test
+    """
+    if mode not in ('expanding', 'sliding'):
+        raise ValueError("mode phải là 'expanding' hoặc 'sliding'.")
+    if test_size is None:
+        test_size = n_samples // (n_folds + 1)
+    if min_train_size is None:
+        min_train_size = n_samples - n_folds * test_size
+    if test_size <= 0 or min_train_size <= 0 or min_train_size + n_folds * test_size > n_samples:
+        raise ValueError("Không đủ dữ liệu cho số fold và kích thước test đã chọn.")
+
+    folds = []
+    first_test_start = n_samples - n_folds * test_size
+    for k in range(n_folds):
+        train_end = first_test_start + k * test_size
+        train_start = 0 if mode == 'expanding' else train_end - min_train_size
+        folds.append((train_start, train_end, train_end + test_size))
+    return folds
+
+def _run_fold(fold_id, df_fold, train_size, features_to_use, target_column,
+              model_config, train_config, scaler_type, seed):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from model_utils import preprocess_data, build_model, train_model, evaluate_model
+
+    tf.keras.utils.set_random_seed(seed + fold_id)
+    n_future = model_config.get('n_future', 1)
+    X_train, y_train, X_test, y_test, scaler, _ = preprocess_data(
+        df_fold,
+        features_to_use,
+        target_column,
+        time_step=train_config['time_step'],
+        scaler_type=scaler_type,
+        train_size=train_size,
+        n_future=n_future
+    )
+    model = build_model(
+        model_config['model_type'],
+        train_config['time_step'],
+        len(features_to_use),
+        model_config['num_neurons'],
+        model_config['dropout_rate'],
+        model_config.get('num_hidden_layers', 2),
+        loss_fn=model_config.get('loss_fn', 'mae'),
+        learning_rate=model_config.get('learning_rate', 0.001),
+        use_batch_norm=model_config.get('use_batch_norm', False),
+        n_future=n_future,
+        precision=model_config.get('precision')
+    )
+    callbacks = [EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)]
+    history = train_model(model, X_train, y_train, train_config, callbacks=callbacks)
+    metrics, _, _ = evaluate_model(
+        model, X_test, y_test, scaler, features_to_use.index(target_column)
+    )
+    return {
+        'fold': fold_id,
+        'train_from': df_fold.index[0],
+        # Cửa sổ test đầu tiên dùng time_step dòng đầu của đoạn test làm input, dự đoán bắt đầu sau đó
+        'test_from': df_fold.index[train_size + train_config['time_step']],
+        'test_to': df_fold.index[-1],
+        'train_samples': len(X_train),
+        'test_samples': len(X_test),
+        'epochs_run': len(history.history['loss']),
+        **{metric: float(value) for metric, value in metrics.items()}
+    }
+
+def run_walk_forward(df, features_to_use, target_column, model_config, train_config,
+                     n_folds=10, mode='expanding', test_size=None, min_train_size=None,
+                     scaler_type='minmax', max_workers=None, seed=42):
+    """
+    Chạy walk-forward trên process pool (mặc định số worker = min(n_folds, số core)).
+    Mỗi worker dùng cpu_count // max_workers thread TF.
+    model_config['n_future'] > 1: mô hình dự đoán trực tiếp nhiều bước, metrics tính trên cả horizon.
+
+    Returns:
+        report: DataFrame metrics theo từng fold
+        summary: DataFrame mean/std của MAE, MSE, RMSE, R² qua các fold
+    """
+    df = df.dropna()
+    time_step = train_config['time_step']
+    n_future = model_config.get('n_future', 1)
+    folds = make_walk_forward_folds(len(df), n_folds, test_size, mode, min_train_size)
+    if folds[0][2] - folds[0][1] < time_step + n_future:
+        raise ValueError(f"Mỗi fold test cần ít nhất time_step + n_future = {time_step + n_future} dòng.")
+
+    cpu_count = os.cpu_count() or 1
+    max_workers = max_workers or min(n_folds, cpu_count)
+    intra_op_threads = max(1, cpu_count // max_workers)
+
+    results = []
+    # TensorFlow không an toàn với fork nên dùng spawn
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp.get_context('spawn'),
+        initializer=init_pool_worker,
+        initargs=(intra_op_threads,)
+    ) as executor:
+        futures = {
+            executor.submit(
+                _run_fold, fold_id, df.iloc[train_start:test_end], train_end - train_start,
+                features_to_use, target_column, model_config, train_config, scaler_type, seed
+            ): fold_id
+            for fold_id, (train_start, train_end, test_end) in enumerate(folds)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"✅ Fold {result['fold'] + 1}/{n_folds}: MAE={result['MAE']:.4f} RMSE={result['RMSE']:.4f}")
+            results.append(result)
+
+    report = pd.DataFrame(results).sort_values('fold').set_index('fold')
+    summary = report[['MAE', 'MSE', 'RMSE', 'R²']].agg(['mean', 'std'])
+    return report, summary